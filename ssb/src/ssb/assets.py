@@ -0,0 +1,85 @@
+'''
+Image atlas for Something Something Bricks. Brick and wall images are packed
+into one opaque surface that is converted to the display format, and handed
+out as subsurfaces.
+
+Created on Oct 18, 2026
+
+@author: Dan
+'''
+
+import pygame
+
+from bundle import bundle
+from color import *
+
+class ImageAtlas:
+  """
+  All brick and wall images packed side by side in one surface. Images are
+  loaded on first use, or up front with prewarm. Once the display exists the
+  atlas is converted to its pixel format so blits don't convert every time.
+  Everything in the atlas is drawn over black, so transparent pixels are
+  filled black and blits are plain copies with no color key.
+  """
+
+  # Directory in the asset bundle where images are kept
+  _img_dir = "images/"
+  # Images in the atlas, by file name without ".png"
+  _image_names = ("red_brick", "green_brick", "blue_brick", "yellow_brick",
+                  "red_breaker", "green_breaker", "blue_breaker", "yellow_breaker",
+                  "red_broken", "green_broken", "blue_broken", "yellow_broken",
+                  "wall_left", "wall_right", "wall_bottom", "wall_bl", "wall_br")
+
+  def __init__(self):
+    """
+    Default constructor. Nothing is loaded until first use.
+    """
+    # Packed surface and its subsurfaces by image name
+    self.surface = None
+    self.images = None
+    # Whether the atlas is in the display's pixel format
+    self.converted = False
+
+  def build(self):
+    """
+    Load all images and pack them into the atlas, converting it to the
+    display format if a display has been set.
+    """
+    loaded = [pygame.image.load(bundle.open(self._img_dir + name + ".png"), name + ".png")
+              for name in self._image_names]
+    width = sum(img.get_width() for img in loaded)
+    height = max(img.get_height() for img in loaded)
+    # Each image's own transparent pixels are left black
+    atlas = pygame.Surface((width, height))
+    atlas.fill(black)
+    rects = []
+    left = 0
+    for img in loaded:
+      rects.append(atlas.blit(img, (left, 0)))
+      left += img.get_width()
+    self.converted = pygame.display.get_surface() is not None
+    if self.converted:
+      atlas = atlas.convert()
+    self.surface = atlas
+    self.images = dict(zip(self._image_names, [atlas.subsurface(rect) for rect in rects]))
+
+  def prewarm(self):
+    """
+    Load the atlas now instead of on first use. Call after the display is set
+    so the atlas is converted to its format.
+    """
+    if self.images is None or not self.converted:
+      self.build()
+
+  def image(self, name):
+    """
+    Return surface for an image.
+    Arguments:
+      name    image file name without ".png"
+    """
+    if self.images is None:
+      self.build()
+    return self.images[name]
+
+# Atlas shared by everything that draws bricks and walls
+atlas = ImageAtlas()
@@ -0,0 +1,88 @@
+'''
+Sound effect queue for Something Something Bricks. Game code asks for sounds
+as things happen and they are played together once per frame.
+
+Created on Oct 18, 2026
+
+@author: Dan
+'''
+
+import pygame
+
+class SoundQueue:
+  """
+  Sounds asked for during a frame are played once each at the end of the
+  frame, however many times they were asked for. They play on a pool of
+  reserved mixer channels. Each sound may use at most a few of them, and
+  when all are busy the channel started longest ago is reused, so a big
+  chain never runs out of channels.
+  """
+
+  def __init__(self, num_channels=6, voices=2):
+    """
+    Default constructor. Channels are reserved on the first flush, once the
+    mixer is running.
+    Arguments:
+      num_channels    number of mixer channels reserved for sound effects
+      voices          most channels one sound can play on at once
+    """
+    self.num_channels = num_channels
+    self.voices = voices
+    # Sounds asked for since the last flush, in order, each once
+    self.pending = []
+    # Reserved channels, and the flush each one last started playing on
+    self.channels = None
+    self.started = [0] * num_channels
+    # Number of flushes so far
+    self.frame = 0
+
+  def play(self, sound):
+    """
+    Ask for a sound to be played at the end of this frame.
+    Arguments:
+      sound    Pygame Sound object
+    """
+    if sound not in self.pending:
+      self.pending.append(sound)
+
+  def reserve(self):
+    """
+    Reserve the channel pool so Sound.play calls elsewhere can't take it.
+    """
+    mixer = pygame.mixer
+    if mixer.get_num_channels() < self.num_channels:
+      mixer.set_num_channels(self.num_channels)
+    mixer.set_reserved(self.num_channels)
+    self.channels = [mixer.Channel(i) for i in range(self.num_channels)]
+
+  def flush(self):
+    """
+    Play the sounds asked for since the last flush. Call once per frame.
+    """
+    self.frame += 1
+    if not self.pending:
+      return
+    pending, self.pending = self.pending, []
+    # No sound output without a mixer
+    if not pygame.mixer.get_init():
+      return
+    if self.channels is None:
+      self.reserve()
+
+    for sound in pending:
+      playing = [i for i, channel in enumerate(self.channels)
+                 if channel.get_busy() and channel.get_sound() is sound]
+      idle = [i for i, channel in enumerate(self.channels) if not channel.get_busy()]
+      # Restart the oldest voice of a sound at its limit, otherwise use a free
+      # channel, otherwise the one started longest ago
+      if len(playing) >= self.voices:
+        i = min(playing, key=self.started.__getitem__)
+      elif idle:
+        i = idle[0]
+      else:
+        i = min(range(self.num_channels), key=self.started.__getitem__)
+      self.channels[i].play(sound)
+      self.started[i] = self.frame
+
+# Queue shared by everything that plays sound effects
+sound_queue = SoundQueue()
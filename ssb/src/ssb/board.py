@@ -1,5 +1,6 @@
 '''
-Object to keep track of the board (stacked bricks) game state.
+Object to draw the board (stacked bricks) and play its sounds. Game rules are
+in engine.Engine.
 
 Created on Dec 22, 2011
 
@@ -7,77 +8,52 @@ Created on Dec 22, 2011
 '''
 
 import hashlib
+import numpy
 import pygame
-import math
-import random
 
-from brick import Brick
-from brick import DoubleBrick
+from assets import atlas
+from audio import sound_queue
+from brick import cell_image, ghost_image
+from bundle import bundle
 from color import *
+from engine import BROKEN, COLOR_MASK, Engine, cell_dtype, drop_cells
+from hint import HintWorker
+from replay import MOVE_LEFT, MOVE_RIGHT, ROTATE_CCW, ROTATE_CW, SLOW_DOWN, SPEED_UP, Replay, seek_replay
+from text import text_cache
 
 class Board:
   """
   Class for play area (stacked bricks).
   """
   
-  # Possible brick colors (R, G, B) triplets
-  _brick_colors = [red, green, blue, yellow]
-  
-  # Brick fallspeed (pixels per loop iteration)
-  _fallspeed_slow = 1
-  _fallspeed_fast = 10
-  
   # High score filename
   _highscore_filename = "highscore.txt"
   
   # Key for hashing score
   _hash_key = "SomethingSomethingBricks"
-      
-  # Probability of getting a breaker brick
-  _breaker_prob = 0.20
-  
+
   # Time to show break graphic before continuing on (in milliseconds) 
   _break_time = 500
   
-  ## Wall images
-  _img_dir = "images/"
-  # Left wall segment
-  _wall_l = pygame.sprite.Sprite()
-  _wall_l.image = pygame.image.load(_img_dir + "wall_left.png")
-  _wall_l.rect = _wall_l.image.get_rect()
-  # Right wall segment
-  _wall_r = pygame.sprite.Sprite()
-  _wall_r.image = pygame.image.load(_img_dir + "wall_right.png")
-  _wall_r.rect = _wall_r.image.get_rect()
-  # Bottom wall segment
-  _wall_b = pygame.sprite.Sprite()
-  _wall_b.image = pygame.image.load(_img_dir + "wall_bottom.png")
-  _wall_b.rect = _wall_b.image.get_rect()
-  # Bottom right corner
-  _wall_br = pygame.sprite.Sprite()
-  _wall_br.image = pygame.image.load(_img_dir + "wall_br.png")
-  _wall_br.rect = _wall_br.image.get_rect()
-  # Bottom left corner
-  _wall_bl = pygame.sprite.Sprite()
-  _wall_bl.image = pygame.image.load(_img_dir + "wall_bl.png")
-  _wall_bl.rect = _wall_bl.image.get_rect()
-  
-  # Fonts directory
-  _font_dir = "fonts/"
+  # Font size for labels and score
+  _font_size = 20
     
-  def __init__(self, board_size, brick_size, mixer):
+  def __init__(self, board_size, brick_size, mixer, update_rate=60):
     """
     Default constructor.
     Arguments:
       board_size    number of (columns, rows)
       brick_size    (x, y) pixel size of each brick
       mixer         Pygame mixer object for sound output.
+      update_rate   number of calls to update per second of game time
     """
     # Save parameters
     self.num_cols, self.num_rows = self.board_size = board_size
     self.bw, self.bh = self.brick_size = brick_size
-    # Column where bricks are spawned (0 indexed)
-    self.gen_col = int(math.ceil(self.num_cols/2))
+    # Number of updates to show break graphic for
+    self.break_updates = self._break_time * update_rate // 1000
+    # Game rules, with y measured in pixels
+    self.engine = Engine(board_size, self.bh)
     # Top left corner (pixels) of game board
     # Indent in by one block on each side
     self.left, self.top = self.topleft = (self.bw, -2*self.bh)
@@ -87,521 +63,495 @@ class Board:
     self.min_pos_y = self.top
     self.max_pos_y = self.top + self.bh * (self.num_rows - 1)
     
-    # Create array of stacked bricks
-    self.clear_board()
-      
-    # Current dropping brick pair
-    self.db = None
     # Position to display next brick
     self.next_topleft = (self.max_pos_x + 2*self.bw, self.min_pos_y + 4*self.bh)
-    # Generate next brick placeholder
-    self.gen_next()
+    
+    # Chain steps left to animate, and the grid shown while animating
+    self.chain = []
+    self.shown_grid = None
+    # Updates left before the current chain step is dropped
+    self.chain_timer = 0
+    # Seed and inputs of the current game
+    self.replay = None
+    # Falling pair and its (col1, y1, col2, y2) before the last update, for
+    # interpolating its drawn position
+    self.prev_pair = None
+    # Whether to show a suggested placement of the falling pair, the worker
+    # searching for it, and the pair it was last asked to search for
+    self.show_hint = False
+    self.hint_worker = None
+    self.hint_pair = None
+    # Whether a new high score from this board is saved. Off for boards
+    # that aren't a single player game, such as in versus.
+    self.keep_highscore = True
+    
+    ## What was last drawn, for finding dirty rectangles
+    self.drawn_pair_rects = []
+    self.drawn_ghost = []
+    self.drawn_grid = numpy.zeros(self.board_size, dtype=cell_dtype)
+    self.drawn_next = None
+    self.drawn_text = ()
+    
+    ## Layers, built on first draw in the format of the target surface
+    # Walls and next brick frame, which never change
+    self.background = None
+    # Stacked bricks, redrawn only where cells changed
+    self.stack = None
+    self.stack_grid = numpy.zeros(self.board_size, dtype=cell_dtype)
     
     ## Sounds
-    # Directory where sounds are kept
+    # Directory in the asset bundle where sounds are kept
     snd_dir = "sounds/"
     # Sound for key press
-    self.snd_key = mixer.Sound(snd_dir + "select.wav")
+    self.snd_key = mixer.Sound(bundle.open(snd_dir + "select.wav"))
     self.snd_key.set_volume(0.1)
     # Sound for bricks broken
-    self.snd_break = mixer.Sound(snd_dir + "break.wav")
+    self.snd_break = mixer.Sound(bundle.open(snd_dir + "break.wav"))
     self.snd_break.set_volume(0.2)
     # Sound when brick reaches bottom
-    self.snd_drop = mixer.Sound(snd_dir + "drop.wav")
+    self.snd_drop = mixer.Sound(bundle.open(snd_dir + "drop.wav"))
     self.snd_drop.set_volume(0.5)
     
     # Get high score
     self.read_highscore()    
   
-  def gen_breaker(self):
-    """
-    Return true with probability _breaker_prob to determine whether
-    a breaker brick is generated.
-    """
-    if random.random() < self._breaker_prob:
-      return True
-    else:
-      return False
-    
-  def gen_next(self):
-    """
-    Generate parameters for next brick.
+  def start(self, seed=None):
     """
-    # Determine next brick colors and breaker status
-    self.next_color = (random.choice(self._brick_colors),random.choice(self._brick_colors)) 
-    self.next_breaker = (self.gen_breaker(), self.gen_breaker()) 
+    Reset game state and start new game, recording it as a replay.
+    Arguments:
+      seed    seed for this game's bricks. Default is a random seed.
+    """
+    self.chain = []
+    self.shown_grid = None
+    self.engine.start(seed)
+    self.replay = Replay(self.board_size, self.bh, self.engine.seed)
+    self.replay.add_keyframe(self.engine)
+    self.update_hint()
   
-  def start(self):
-    """
-    Reset game state and start new game.
-    """
-    # Reset game board
-    self.clear_board()
-    # Drop a new brick
-    self.create_brick()    
-      
-  def clear_board(self):
-    """
-    Reset game board to all blank bricks and reset all state.
-    """
-    # Blank all brick spaces
-    self.stacked_bricks = [0]*self.num_cols
-    for col in range(self.num_cols):
-      self.stacked_bricks[col] = [Brick()]*self.num_rows
-    # Reset fallspeed
-    self._fallspeed_slow = 1
-    self.fallspeed = self._fallspeed_slow
-    # Reset score
-    self.score = 0
-    # Start state is falling brick
-    self.state = "fall"
-      
-  def create_brick(self):
+  def record(self, action):
     """
-    Create a new dropping brick.
+    Add an input to the replay, timed by the engine's updates so far.
+    Arguments:
+      action    input, such as MOVE_LEFT
     """
-    # Create a dropping brick pair
-    self.db = DoubleBrick(self.next_color, self.next_breaker, 
-                          (self.gen_col*self.bw + self.left, self.top), self.brick_size)
-    # Determine next brick colors and breaker status
-    self.gen_next()
+    self.replay.record(self.engine.ticks, action)
   
-  def col_top(self, col):
+  def save_replay(self, filename):
     """
-    Return the top brick in column col that is not empty.
+    Write the replay of the current game to a file.
     Arguments:
-      col    column to return top brick of.
+      filename    name of replay file
     """
-    for row in range(self.num_rows):
-      if not self.stacked_bricks[col][row].empty():
-        return self.stacked_bricks[col][row]
-    # If no brick's found
-    return None
-      
-  def col_pix_top(self, col):
+    self.replay.finish(self.engine)
+    self.replay.save(filename)
+  
+  def seek_replay(self, player, ticks):
     """
-    Return top pixel of first (bottom) brick in column col that is empty.
+    Jump a replay being watched forward or back. Return the ReplayPlayer to
+    continue it with.
     Arguments:
-      col    column to return top pixel of.
-    """
-    if self.col_top(col):
-      return self.col_top(col).rect.top - self.bh
-    # No bricks found
-    else:
-      # Return bottom edge
-      return self.max_pos_y
-      
-  def b1(self):
-    """
-    Return first (originally top) brick.
-    """
-    if self.db:
-      return self.db.brick1
-    else:
-      return None
+      player    ReplayPlayer being watched
+      ticks     number of engine updates to jump, negative to go back
+    """
+    self.chain = []
+    self.shown_grid = None
+    self.prev_pair = None
+    tick = min(max(self.engine.ticks + ticks, 0), player.replay.end_tick)
+    player = seek_replay(player.replay, self.engine, tick)
+    self.update_hint()
+    return player
   
-  def b2(self):
+  def toggle_hint(self):
     """
-    Return second (originally bottom) brick.
+    Show or hide the suggested placement of the falling pair.
     """
-    if self.db:
-      return self.db.brick2
+    self.show_hint = not self.show_hint
+    if self.show_hint:
+      if self.hint_worker is None:
+        self.hint_worker = HintWorker(self.board_size, self.bh)
+      self.update_hint()
     else:
-      return None
+      self.hint_worker.cancel()
+      self.hint_pair = None
   
-  def b1_col(self):
-    """
-    Column of first (originally top) brick.
-    """
-    return (self.b1().rect.left - self.left)/self.bw
-
-  def b2_col(self):
-    """
-    Column of second (originally bottom) brick.
-    """
-    return (self.b2().rect.left - self.left)/self.bw
+  def update_hint(self):
+    """
+    Start a hint search once a new pair has spawned, cancelling the search
+    for the last one. The search runs on the hint worker's thread, so this
+    doesn't wait for it.
+    """
+    p = self.engine.pair
+    if not self.show_hint or p is self.hint_pair:
+      return
+    self.hint_pair = p
+    if p:
+      self.hint_worker.search(self.engine)
+    else:
+      self.hint_worker.cancel()
   
   def move_left(self):
     """
     Move dropping brick to the left.
     """
-    if self.db and not self.game_over():
-      # Check that there is space on the left
-      if self.db.left_edge() > self.min_pos_x and \
-        self.db.bottom_edge() < self.col_pix_top(self.b1_col() - 1) and \
-        self.db.top_edge() < self.col_pix_top(self.b2_col() - 1):
-        # Move both bricks to the left
-        self.b1().rect.left -= self.bw
-        self.b2().rect.left -= self.bw
-        self.snd_key.play()
+    self.record(MOVE_LEFT)
+    if self.engine.move_left():
+      sound_queue.play(self.snd_key)
         
   def move_right(self):
     """
     Move dropping brick to the right.
     """
-    if self.db and not self.game_over():
-      # Check that there is space on the right
-      if self.db.right_edge() < self.max_pos_x and \
-        self.db.bottom_edge() < self.col_pix_top(self.b1_col() + 1) and \
-        self.db.top_edge() < self.col_pix_top(self.b2_col() + 1):
-        self.b1().rect.left += self.bw
-        self.b2().rect.left += self.bw
-        self.snd_key.play()
+    self.record(MOVE_RIGHT)
+    if self.engine.move_right():
+      sound_queue.play(self.snd_key)
   
   def rotate_cw(self):
     """
     Rotate first (originally top) brick clockwise around second brick.
     """
-    if self.db and not self.game_over():
-      # If first brick above second
-      if self.b1().rect.top < self.b2().rect.top and \
-        self.db.right_edge() < self.max_pos_x and self.db.bottom_edge() < self.col_pix_top(self.b1_col() + 1):
-        self.b1().rect.top += self.bh
-        self.b1().rect.left += self.bw
-        self.snd_key.play()
-      # first brick below second
-      elif self.b1().rect.top > self.b2().rect.top and \
-        self.db.left_edge() > self.min_pos_x and self.db.top_edge() < self.col_pix_top(self.b1_col() - 1):
-        self.b1().rect.top -= self.bh
-        self.b1().rect.left -= self.bw
-        self.snd_key.play()  
-      # first brick to the right of the second
-      elif self.b1().rect.left > self.b2().rect.left and \
-        self.db.bottom_edge() + self.bh < self.col_pix_top(self.b1_col() - 1):
-        self.b1().rect.top += self.bh
-        self.b1().rect.left -= self.bw
-        self.snd_key.play()
-      # first brick to the left of the second
-      elif self.b1().rect.left < self.b2().rect.left:
-        self.b1().rect.top -= self.bh
-        self.b1().rect.left += self.bw
-        self.snd_key.play()
+    self.record(ROTATE_CW)
+    if self.engine.rotate_cw():
+      sound_queue.play(self.snd_key)
   
   def rotate_ccw(self):
     """
     Rotate first (originally top) brick counter-clockwise around second brick.
     """
-    if self.db and not self.game_over():
-      # If first brick above second
-      if self.b1().rect.top < self.b2().rect.top and \
-        self.db.left_edge() > self.min_pos_x and self.db.bottom_edge() < self.col_pix_top(self.b1_col() - 1):
-        self.b1().rect.top += self.bh
-        self.b1().rect.left -= self.bw
-        self.snd_key.play()
-      # first brick below second
-      elif self.b1().rect.top > self.b2().rect.top and \
-        self.db.right_edge() < self.max_pos_x and self.db.top_edge() < self.col_pix_top(self.b1_col() + 1):
-        self.b1().rect.top -= self.bh
-        self.b1().rect.left += self.bw
-        self.snd_key.play()
-      # first brick to the right of the second
-      elif self.b1().rect.left > self.b2().rect.left:
-        self.b1().rect.top -= self.bh
-        self.b1().rect.left -= self.bw
-        self.snd_key.play()
-      # first brick to the left of the second
-      elif self.b1().rect.left < self.b2().rect.left and \
-        self.db.bottom_edge() + self.bh < self.col_pix_top(self.b1_col() + 1):
-        self.b1().rect.top += self.bh
-        self.b1().rect.left += self.bw
-        self.snd_key.play() 
+    self.record(ROTATE_CCW)
+    if self.engine.rotate_ccw():
+      sound_queue.play(self.snd_key)
   
   def speed_up(self):
     """
     Increase fallspeed to fast.
     """
-    if not self.game_over():
-      self.fallspeed = self._fallspeed_fast
+    self.record(SPEED_UP)
+    self.engine.speed_up()
   
   def slow_down(self):
     """
     Decrease fallspeed to slow.
     """
-    if not self.game_over():
-      self.fallspeed = self._fallspeed_slow
+    self.record(SLOW_DOWN)
+    self.engine.slow_down()
     
   def update(self):
     """
-    Drop brick by fallspeed. If the bottom is reached, then handle breaking
-    and spawn a new brick.
-    """
-    # If handling breaking
-    if self.state == "break":
-      # Break bricks given current stacked bricks
-      broken = self.break_bricks()              
-      # Collapse bricks from above if any bricks were broken
-      if broken:
-        self.state = "drop"
-      # Otherwise, continue on
-      else:
-        # Fall speed increases as points are scored
-        self._fallspeed_slow = int(self.score/200) + 1
-        self.fallspeed = self._fallspeed_slow
-        # Create a new brick after all breaks have occurred
-        self.state = "new_brick"
-        
-    # Drop bricks to fill holes after breaking bricks
-    elif self.state == "drop":
-      pygame.time.wait(self._break_time)    
-      self.drop_bricks()
-      # Rerun breaking to find combos
-      self.state = "break"
-      
-    # Create new brick after breaking
-    elif self.state == "new_brick":
-      # Create new brick if the game is not over
-      if (self.stacked_bricks[self.gen_col][1].empty() and \
-      self.stacked_bricks[self.gen_col][2].empty()):
-        self.create_brick()
-        # Go back to dropping brick
-        self.state = "fall"
-      else:
-        # If the game is over because another spawned brick cannot fall,
-        # still create a new one
-        if self.stacked_bricks[self.gen_col][1].empty():
-          self.create_brick()
-        # Game state is set to game over
-        self.state = "game_over"
-      
-    # Update falling brick
-    elif self.state == "fall":
-      # If the brick pair hasn't reached the bottom,
-      if self.b1().rect.top < self.col_pix_top(self.b1_col()) - self.fallspeed and \
-        self.b2().rect.top < self.col_pix_top(self.b2_col()) - self.fallspeed:
-        # Drop bricks
-        self.b1().rect.top += self.fallspeed
-        self.b2().rect.top += self.fallspeed
-      # Else one of the bricks has reached the top of a column
-      # In this case, both bricks are dropped
+    Advance the game engine by one step and play sounds for what happened.
+    While a chain is being animated, the engine waits.
+    """
+    if self.chain:
+      self.animate_chain()
+      return
+    
+    p = self.engine.pair
+    if p:
+      self.prev_pair = (p, p.col1, p.y1, p.col2, p.y2)
+    # Grid before the chain is resolved, to animate the chain from
+    if self.engine.state == "break":
+      self.shown_grid = self.engine.grid.copy()
+    self.engine.update()
+    self.replay.after_update(self.engine)
+    self.update_hint()
+    for event in self.engine.events:
+      # Sound for brick reaching bottom
+      if event == "lock":
+        sound_queue.play(self.snd_drop)
+    
+    if self.shown_grid is not None:
+      if self.engine.chain:
+        self.chain = list(self.engine.chain)
+        self.show_chain_step()
       else:
-        # Sound for brick reaching bottom
-        self.snd_drop.play()
-            
-        # Brick that hits a surface first needs to handled first (in case stacked)
-        # Set the one that hits first as b1 and it's column as c1
-        # The other one is b2 in column c2
-        if self.b2().rect.top >= self.col_pix_top(self.b2_col()) - self.fallspeed:
-          b2, b1 = self.b1(), self.b2()
-          c2, c1 = self.b1_col(), self.b2_col()
-        else:
-          b1, b2 = self.b1(), self.b2()
-          c1, c2 = self.b1_col(), self.b2_col()
-        # Drop bottom brick to bottom
-        b1.rect.top = self.col_pix_top(c1)
-        # Save to array
-        self.stacked_bricks[b1.get_col_index()][b1.get_row_index()] = b1
-        # Now drop the other brick to the bototm
-        b2.rect.top = self.col_pix_top(c2)
-        # Save to array
-        self.stacked_bricks[b2.get_col_index()][b2.get_row_index()] = b2
-        # Remove dropping brick while handling break
-        self.db = None
+        self.shown_grid = None
   
-        # Next, handle any breaking of bricks
-        self.state = "break"
-
-    elif self.state == "game_over":
-      pass
+  def show_chain_step(self):
+    """
+    Show the bricks broken by the first chain step left to animate.
+    """
+    step = self.chain[0]
+    for col, row in step.broken:
+      self.shown_grid[col, row] = (self.shown_grid[col, row] & COLOR_MASK) | BROKEN
+    # Sound for breaking bricks, once however many breakers went off
+    if step.breakers:
+      sound_queue.play(self.snd_break)
+    self.chain_timer = self.break_updates
+  
+  def animate_chain(self):
+    """
+    Once the break graphic has been shown for _break_time, drop the broken
+    bricks and show the next chain step. Counted in updates so game speed
+    doesn't depend on frame rate.
+    """
+    self.chain_timer -= 1
+    if self.chain_timer > 0:
+      return
+    drop_cells(self.shown_grid)
+    self.chain.pop(0)
+    if self.chain:
+      self.show_chain_step()
     else:
-      raise Exception("Unknown state in game board.")
-      
-  def break_bricks(self):
+      self.shown_grid = None
+  
+  def cell_pos(self, col, y):
     """
-    Remove any bricks marked as broken.
-    """ 
-    # If any bricks were broken
-    broken = False
-    # Scan through array
-    for col in range(self.num_cols):
-      for row in range(self.num_rows):
-        # If breaker is touching a brick with the same color
-        if self.stacked_bricks[col][row].breaker:
-          breaker_color = self.stacked_bricks[col][row].color
-          if (col > 0 and self.stacked_bricks[col-1][row].color == breaker_color) or \
-            (col < self.num_cols-1 and self.stacked_bricks[col+1][row].color == breaker_color) or \
-            (row > 0 and self.stacked_bricks[col][row-1].color == breaker_color) or \
-            (row < self.num_rows-1 and self.stacked_bricks[col][row+1].color == breaker_color):
-            # Use spread_break to recursively break proper bricks
-            self.spread_break(col, row, breaker_color)
-            # Play sound for breaking bricks
-            self.snd_break.play()
-            # Bricks have been broken
-            broken = True
-            
-    return broken
-        
-  def drop_bricks(self):
+    Return (x, y) pixel topleft of a brick given its column and engine y.
+    Arguments:
+      col    column index
+      y      engine y offset from top of board
     """
-    Fill in any empty spaces by moving bricks above down.
+    return (self.left + col*self.bw, self.top + y)
+  
+  def pair_y(self, alpha):
     """
-    # Handle each column individual
-    for col in range(self.num_cols):
-      # If top row is broken
-      if self.stacked_bricks[col][0].broken:
-        # Replace with an empty brick
-        self.stacked_bricks[col][0] = Brick()
-      # For each row, starting from the top
-      for row in range(self.num_rows - 1):
-        # If the next spot is a broken brick
-        if self.stacked_bricks[col][row+1].broken:
-          # Move all bricks above down a space, starting from the bottom
-          for drop_row in range(row, -1, -1):
-            self.stacked_bricks[col][drop_row].rect.top += self.bh
-            self.stacked_bricks[col][drop_row + 1] = self.stacked_bricks[col][drop_row]
-          # Create an empty brick at the top
-          self.stacked_bricks[col][0] = Brick()
-
-  def spread_break(self, col, row, breaker_color):
+    Return (y1, y2) of the falling pair to draw, interpolated between its
+    position before and after the last update. Moved or rotated pairs are
+    not interpolated.
+    Arguments:
+      alpha    fraction (0 to 1) of the way from the last update to the next
+    """
+    p = self.engine.pair
+    prev = self.prev_pair
+    if prev and prev[0] is p and prev[1] == p.col1 and prev[3] == p.col2 and \
+      prev[4] - prev[2] == p.y2 - p.y1:
+      fall = int((p.y1 - prev[2]) * alpha)
+      return (prev[2] + fall, prev[4] + fall)
+    return (p.y1, p.y2)
+  
+  def shown(self):
+    """
+    Return grid of stacked bricks to draw. Chains show their animation.
     """
-    Break the brick at col, row and recursively call on surrounding bricks.
+    if self.shown_grid is None:
+      return self.engine.grid
+    return self.shown_grid
+  
+  def pair_rects(self, alpha):
+    """
+    Return list of rects the falling pair is drawn to.
     Arguments:
-      col               Column index to spread break
-      row               Row index to spread break
-      breaker_color     Color of break to spread
-    """
-    # Replace image with a broken brick
-    self.stacked_bricks[col][row].break_brick()  
-    # Increment score for each brick destroyed
-    self.score += 10
+      alpha    fraction (0 to 1) of the way from the last update to the next
+    """
+    p = self.engine.pair
+    if not p:
+      return []
+    y1, y2 = self.pair_y(alpha)
+    return [pygame.Rect(self.cell_pos(p.col1, y1), self.brick_size),
+            pygame.Rect(self.cell_pos(p.col2, y2), self.brick_size)]
+  
+  def ghost_blits(self):
+    """
+    Return list of (image, rect) for the suggested placement of the falling
+    pair, from the latest finished hint search. Empty if hints are hidden or
+    the search for this pair hasn't finished.
+    """
+    p = self.engine.pair
+    if not self.show_hint or not p or p is not self.hint_pair:
+      return []
+    plan = self.hint_worker.plan()
+    if not plan:
+      return []
+    (col1, row1), (col2, row2) = plan.cells
+    return [(ghost_image(p.code1), pygame.Rect(self.cell_pos(col1, row1*self.bh), self.brick_size)),
+            (ghost_image(p.code2), pygame.Rect(self.cell_pos(col2, row2*self.bh), self.brick_size))]
+  
+  def text_lines(self):
+    """
+    Return list of (msg, topleft) for the score text.
+    """
+    # Location to print score
+    left, top = self.max_pos_x + 2*self.bw, self.min_pos_y + 11*self.bh
+    return [("Score: %d" % self.engine.score, (left, top)),
+            ("High score: %d" % self.highscore, (left, top + self.bh))]
+  
+  def game_over_rect(self):
+    """
+    Return rect of "Game Over" text box.
+    """
+    center = (int((self.min_pos_x + self.max_pos_x + self.bw)/2), 
+              int((self.min_pos_y + self.max_pos_y + self.bh)/2))
+    return text_cache.render("Game Over", self._font_size, white, dark_gray).get_rect(center=center)
   
-    # Spread to surrounding blue bricks
-    if col > 0 and self.stacked_bricks[col-1][row].color == breaker_color:
-      self.spread_break(col-1, row, breaker_color)
-    if col < self.num_cols-1 and self.stacked_bricks[col+1][row].color == breaker_color:
-      self.spread_break(col+1, row, breaker_color)
-    if row > 0 and self.stacked_bricks[col][row-1].color == breaker_color:
-      self.spread_break(col, row-1, breaker_color)
-    if row < self.num_rows-1 and self.stacked_bricks[col][row+1].color == breaker_color:
-      self.spread_break(col, row+1, breaker_color)
+  def dirty_rects(self, alpha=1.0):
+    """
+    Return list of rects whose drawing changed since the last call: the
+    falling pair's old and new positions, the hint ghost, changed stacked
+    bricks, the next brick, and score and game over text.
+    Arguments:
+      alpha    fraction (0 to 1) of the way from the last update to the next
+    """
+    rects = []
+    # Falling pair
+    pair_rects = self.pair_rects(alpha)
+    if pair_rects != self.drawn_pair_rects:
+      rects += self.drawn_pair_rects + pair_rects
+      self.drawn_pair_rects = pair_rects
+    
+    # Hint ghost, which changes when its search finishes
+    ghost = self.ghost_blits()
+    if ghost != self.drawn_ghost:
+      rects += [rect for image, rect in self.drawn_ghost + ghost]
+      self.drawn_ghost = ghost
+    
+    # Locked, broken and dropped bricks
+    grid = self.shown()
+    cols, rows = (grid != self.drawn_grid).nonzero()
+    if cols.size:
+      for col, row in zip(cols, rows):
+        rects.append(pygame.Rect(self.cell_pos(col, row*self.bh), self.brick_size))
+      self.drawn_grid = grid.copy()
     
-  def draw_bricks(self, surface):
+    # Next brick
+    if self.engine.next_codes != self.drawn_next:
+      rects.append(pygame.Rect(self.next_topleft, (self.bw, 2*self.bh)))
+      self.drawn_next = self.engine.next_codes
+    
+    # Score text, both old and new in case the text got shorter
+    text = (self.text_lines(), self.game_over())
+    if text != self.drawn_text:
+      for lines, game_over in (self.drawn_text, text) if self.drawn_text else (text,):
+        for msg, topleft in lines:
+          rects.append(text_cache.render(msg, self._font_size).get_rect(topleft=topleft))
+        if game_over:
+          rects.append(self.game_over_rect())
+      self.drawn_text = text
+    return rects
+  
+  def draw_bricks(self, surface, alpha=1.0):
     """
-    Draw all bricks (stacked and dropping) to the passed Pygame Surface.
+    Draw all bricks (stacked and dropping) to the passed Pygame Surface. The
+    stack layer, hint ghost, falling pair and next brick go out in one blits
+    call.
+    Arguments:
+      surface    Pygame surface to draw to
+      alpha      fraction (0 to 1) of the way from the last update to the next
     """
-    if self.db:
+    engine = self.engine
+    blits = [(self.stack_layer(surface), self.cell_pos(0, 0))] + self.ghost_blits()
+    if engine.pair:
       # Dropping brick
-      surface.blit(self.b1().image, self.b1().rect)
-      surface.blit(self.b2().image, self.b2().rect)
-      
-    # Draw "Next" label
-    font_obj = pygame.font.Font(self._font_dir + "OpenSans-Regular.ttf", 20)
-    self.print_surface("Next", surface, (self.max_pos_x + int(self.bw*3/2), self.min_pos_y + 3*self.bh - 10), font_obj)
-    # Draw next brick
-    next_db = DoubleBrick(self.next_color, self.next_breaker, self.next_topleft, self.brick_size)
-    surface.blit(next_db.brick1.image, next_db.brick1.rect)
-    surface.blit(next_db.brick2.image, next_db.brick2.rect)
-    # Draw rectangle around next brick
-    pygame.draw.rect(surface, white, pygame.rect.Rect((self.max_pos_x + int(self.bw*7/4), self.min_pos_y + int(self.bh*15/4)), (int(self.bw*3/2), int(self.bh*5/2))), 2)
-    
-    # Stacked bricks
-    for col in range(self.num_cols):
-      for row in range(self.num_rows):
-        surface.blit(self.stacked_bricks[col][row].image, self.stacked_bricks[col][row].rect)
+      p = engine.pair
+      rect1, rect2 = self.pair_rects(alpha)
+      blits.append((cell_image(p.code1), rect1))
+      blits.append((cell_image(p.code2), rect2))
+    # Next brick
+    next_x, next_y = self.next_topleft
+    blits.append((cell_image(engine.next_codes[0]), (next_x, next_y)))
+    blits.append((cell_image(engine.next_codes[1]), (next_x, next_y + self.bh)))
+    surface.blits(blits, False)
+  
+  def stack_layer(self, surface):
+    """
+    Return surface of the stacked bricks, the size of the play area. Only
+    cells that changed since the last call are redrawn, and empty cells are
+    just filled black.
+    Arguments:
+      surface    Pygame surface the layer will be drawn to, for pixel format
+    """
+    if self.stack is None:
+      self.stack = pygame.Surface((self.num_cols*self.bw, self.num_rows*self.bh), 0, surface)
+      self.stack.fill(black)
+      self.stack_grid[:] = 0
+    grid = self.shown()
+    cols, rows = (grid != self.stack_grid).nonzero()
+    if cols.size:
+      blits = []
+      for col, row in zip(cols, rows):
+        rect = pygame.Rect((col*self.bw, row*self.bh), self.brick_size)
+        self.stack.fill(black, rect)
+        if grid[col, row]:
+          blits.append((cell_image(grid[col, row]), rect))
+      self.stack.blits(blits, False)
+      self.stack_grid[:] = grid
+    return self.stack
+
+  def draw_background(self, surface):
+    """
+    Draw the background layer (black, walls and next brick frame) to the
+    passed Pygame surface, covering all of it.
+    Arguments:
+      surface    Pygame surface to draw to
+    """
+    if self.background is None or self.background.get_size() != surface.get_size():
+      self.background = pygame.Surface(surface.get_size(), 0, surface)
+      self.background.fill(black)
+      self.draw_walls(self.background)
+      # Draw "Next" label
+      self.print_surface("Next", self.background, (self.max_pos_x + int(self.bw*3/2), self.min_pos_y + 3*self.bh - 10))
+      # Draw rectangle around next brick
+      pygame.draw.rect(self.background, white, pygame.rect.Rect((self.max_pos_x + int(self.bw*7/4), self.min_pos_y + int(self.bh*15/4)), (int(self.bw*3/2), int(self.bh*5/2))), 2)
+    surface.blit(self.background, (0, 0))
 
   def draw_walls(self, surface):
     """
     Draw walls of board area to the passed Pygame surface.
     """   
     # Draw walls
+    blits = []
     # Left and right walls
     for row in range(self.num_rows):
-      self._wall_l.rect.topleft = (self.left - self.bw, self.bh*row + self.top)
-      surface.blit(self._wall_l.image, self._wall_l.rect)
-      self._wall_r.rect.topleft = (self.left + self.num_cols*self.bw, self.top + self.bh*row)
-      surface.blit(self._wall_r.image, self._wall_r.rect)
+      blits.append((atlas.image("wall_left"), (self.left - self.bw, self.bh*row + self.top)))
+      blits.append((atlas.image("wall_right"), (self.left + self.num_cols*self.bw, self.top + self.bh*row)))
     # Bottom wall
     for col in range(self.num_cols):
-      self._wall_b.rect.topleft = ((self.left + col*self.bw, self.top + self.bh*self.num_rows))
-      surface.blit(self._wall_b.image, self._wall_b.rect)
+      blits.append((atlas.image("wall_bottom"), (self.left + col*self.bw, self.top + self.bh*self.num_rows)))
     # Bottom corners
-    self._wall_br.rect.topleft = (self.left + self.num_cols*self.bw, self.top + self.bh*self.num_rows)
-    self._wall_bl.rect.topleft = (self.left - self.bw, self.top + self.bh*self.num_rows) 
-    surface.blit(self._wall_br.image, self._wall_br.rect)      
-    surface.blit(self._wall_bl.image, self._wall_bl.rect)
+    blits.append((atlas.image("wall_br"), (self.left + self.num_cols*self.bw, self.top + self.bh*self.num_rows)))
+    blits.append((atlas.image("wall_bl"), (self.left - self.bw, self.top + self.bh*self.num_rows)))
+    surface.blits(blits, False)
   
   def draw_score(self, surface):
     """
     Write the current score to the passed surface. Also note whether game is over.
     """
-    # Font object for rendering text
-    font_obj = pygame.font.Font(self._font_dir + "OpenSans-Regular.ttf", 20)
-    # Location to print score
-    topleft = [self.max_pos_x + 2*self.bw, self.min_pos_y + 11*self.bh]
-    # Print score to screen
-    self.print_surface("Score: %d" % self.score, surface, topleft, font_obj)
-    # Print highscore to screen
-    topleft[1] += self.bh
-    self.print_surface("High score: %d" % self.highscore, surface, topleft, font_obj)
+    # Print score and highscore to screen
+    surface.blits([(text_cache.render(msg, self._font_size), topleft) for msg, topleft in self.text_lines()], False)
     
     # If game is over
     if self.game_over():
-      # Location to print to
-      center = (int((self.min_pos_x + self.max_pos_x + self.bw)/2), 
-                 int((self.min_pos_y + self.max_pos_y + self.bh)/2))
       # Print Game Over
-      self.print_surface_center("Game Over", surface, center, font_obj, white, dark_gray)
+      self.print_surface_center("Game Over", surface, self.game_over_rect().center, white, dark_gray)
       
       # If we have a new high score,
-      if self.score > self.highscore:
+      if self.keep_highscore and self.engine.score > self.highscore:
         # Update high score
-        self.highscore = self.score
+        self.highscore = self.engine.score
         # Save it to file 
         self.write_highscore()
     
-  def print_surface(self, msg, surface, topleft, font_obj):
+  def print_surface(self, msg, surface, topleft):
     """
     Print the passed msg string to the surface at location specified by topleft.
     Arguments
       msg        String to be displayed.
       surface    Pygame surface to print string to.
       topleft    (x, y) top left corner of location to print to.
-      font_obj   Pygame font object for text rendering.
     """
-    # Surface containing game over text
-    # Do not anti-alias, render in white
-    msg_surface = font_obj.render(msg, True, white)
-    # Create rect object to specify where to place text
-    msg_rect = msg_surface.get_rect()
-    msg_rect.topleft = topleft
-    surface.blit(msg_surface, msg_rect)
+    # Rendered in white, only when the text changes
+    surface.blit(text_cache.render(msg, self._font_size), topleft)
   
-  def print_surface_center(self, msg, surface, center, font_obj, color=white, bg_color=None):
+  def print_surface_center(self, msg, surface, center, color=white, bg_color=None):
     """
     Print the passed msg string to the surface at location specified by center.
     Arguments
       msg        String to be displayed.
       surface    Pygame surface to print string to.
       center     (x, y) center location of where to print to
-      font_obj   Pygame font object for text rendering.
       color      Color to use for printing.
       bg_color   Background color for text box. Default is no box.
     """
-    # Surface containing game over text
-    # Do not anti-alias, render in white
-    msg_surface = font_obj.render(msg, True, color)
+    # Text is rendered onto its background box, only when the text changes
+    msg_surface = text_cache.render(msg, self._font_size, color, bg_color)
     # Create rect object to specify where to place text
     msg_rect = msg_surface.get_rect()
     msg_rect.center = center
-    
-    # Draw background box if there is one
-    if bg_color:
-      bg_surface = msg_surface.copy()
-      bg_surface.fill(bg_color)
-      bg_rect = bg_surface.get_rect()
-      bg_rect.center = center
- 
-    # Draw background box to surface first
-    surface.blit(bg_surface, bg_rect)
-    # Then, draw text to surface
     surface.blit(msg_surface, msg_rect)
         
   def game_over(self):
     """
     Return whether the game is over.
     """
-    return self.state == "game_over"
-    #return not (self.stacked_bricks[self.gen_col][1].empty() and \
-    #  self.stacked_bricks[self.gen_col][2].empty())
+    return self.engine.game_over()
   
   def read_highscore(self):
     """
@@ -627,9 +577,9 @@ class Board:
         self.highscore = highscore
       else:
         # Otherwise, raise exception
-        raise Exception("High score hash check failed.")
+        raise ValueError("High score hash check failed.")
     # If getting high score fails, then reset to high score of 0
-    except:
+    except (IOError, ValueError):
       self.highscore = 0
       # Write high score of 0 to file
       self.write_highscore()
@@ -651,7 +601,7 @@ class Board:
     # Create hash object
     h = hashlib.new("sha256")
     # Add score string
-    h.update("%d%s" % (score, self._hash_key))
+    h.update(("%d%s" % (score, self._hash_key)).encode("utf-8"))
     # Return hash of score
     return h.hexdigest()
     
\ No newline at end of file
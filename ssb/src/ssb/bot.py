@@ -0,0 +1,383 @@
+'''
+Placement search bot for Something Something Bricks. Lists every placement
+the falling pair can reach, simulates the lock and chain of each on a scratch
+engine, and picks the best with a beam search over the falling and next
+pairs. Positions are Zobrist hashed into a bounded transposition table so
+positions seen before aren't simulated or evaluated again.
+
+Run this module to check placements simulated by the bot land and chain the
+same as when the engine plays them out:
+
+  python bot.py [GAMES]
+
+Created on Oct 18, 2026
+
+@author: Dan
+'''
+
+import collections
+import numpy
+import random
+import sys
+
+from engine import (ABOVE, BELOW, BROKEN, CCW, CW, EMPTY, LEFT, LEFT_OF, RIGHT, RIGHT_OF, Engine,
+                    active_colors, rotations, same_color_links)
+
+# Best placement found by Bot.plan. moves lists LEFT, RIGHT, CW and CCW to
+# apply to the falling pair before dropping it, cells are the (col, row) the
+# first and second brick land in, and value is the search value.
+Plan = collections.namedtuple("Plan", "moves cells value")
+
+def evaluate(grids, tops, gen_col):
+  """
+  Default evaluation of settled grids, higher is better. Rewards same color
+  neighbors, which grow into big breaks, and penalizes tall columns, most of
+  all the spawn column. Return array of one value per grid.
+    grids      (N, cols, rows) array of cell codes
+    tops       (N, cols) array of column tops of grids
+    gen_col    column where bricks are spawned
+  """
+  num_rows = grids.shape[-1]
+  heights = num_rows - tops
+  horizontal, vertical = same_color_links(active_colors(grids))
+  links = horizontal.sum(axis=(-2, -1)) + vertical.sum(axis=(-2, -1))
+  danger = numpy.maximum(heights[..., gen_col] - num_rows // 2, 0)
+  return 2.0*links - 0.5*(heights**2).sum(axis=-1) - 20.0*danger**2
+
+class Zobrist:
+  """
+  Zobrist hashing of grids: one random 64-bit key per cell and code, XORed
+  together over the cells. Changing a cell changes the hash by two XORs.
+  """
+
+  def __init__(self, board_size, seed=0):
+    """
+    Default constructor.
+    Arguments:
+      board_size    number of (columns, rows)
+      seed          seed for the random keys
+    """
+    self.num_cols, self.num_rows = board_size
+    num_codes = BROKEN << 1
+    keys = numpy.random.RandomState(seed).randint(1, 1 << 62, size=(self.num_cols*self.num_rows, num_codes))
+    # Empty cells don't change the hash
+    keys[:, EMPTY] = 0
+    self.keys = keys
+    self.cell_keys = keys.tolist()
+    self.cell_index = numpy.arange(self.num_cols*self.num_rows)
+
+  def hash(self, grid):
+    """
+    Return hash of a whole grid.
+    Arguments:
+      grid    array of cell codes
+    """
+    return int(numpy.bitwise_xor.reduce(self.keys[self.cell_index, grid.ravel()]))
+
+  def key(self, col, row, code):
+    """
+    Return key to XOR into a hash for a cell holding code.
+    Arguments:
+      col     column of cell
+      row     row of cell
+      code    cell code
+    """
+    return self.cell_keys[col*self.num_rows + row][code]
+
+class TranspositionTable:
+  """
+  Bounded cache of search results by position. The least recently used
+  entries are dropped once it is full.
+  """
+
+  def __init__(self, max_entries=20000):
+    """
+    Default constructor.
+    Arguments:
+      max_entries    number of entries to keep
+    """
+    self.max_entries = max_entries
+    self.entries = collections.OrderedDict()
+    # Lookups found and not found, for tuning
+    self.hits = 0
+    self.misses = 0
+
+  def get(self, key):
+    """
+    Return entry for key, or None if there isn't one.
+    """
+    # Take out and put back so the entry becomes the most recently used
+    value = self.entries.pop(key, None)
+    if value is None:
+      self.misses += 1
+      return None
+    self.hits += 1
+    self.entries[key] = value
+    return value
+
+  def put(self, key, value):
+    """
+    Add entry for key.
+    """
+    if len(self.entries) >= self.max_entries:
+      self.entries.popitem(last=False)
+    self.entries[key] = value
+
+class Bot:
+  """
+  Picks where to put the falling pair. Each placement is scored by the
+  points its chain makes plus an evaluation of the grid it leaves. Beam
+  search keeps the best beam_width placements of each pair and expands them
+  with the next pair.
+
+  Placements follow VectorBoard's rule rather than Engine's when a brick
+  would lock above the top row: the bot counts it as game over, where
+  Engine wraps the brick to the bottom cell of its column and plays on. So
+  the bot never picks such a placement, though Engine would allow it.
+  """
+
+  # Marks placements that end the game in the transposition table
+  _game_over = ()
+
+  def __init__(self, board_size, row_height=32, evaluate=evaluate, depth=2, beam_width=4,
+               table_size=20000):
+    """
+    Default constructor.
+    Arguments:
+      board_size    number of (columns, rows)
+      row_height    engine y units per row
+      evaluate      function (grids, tops, gen_col) returning the values of
+                    a stack of settled grids, higher is better. Grids are
+                    evaluated together in one call per depth.
+      depth         number of pairs to look at: 1 for the falling pair, 2 to
+                    include the next pair
+      beam_width    placements kept at each depth
+      table_size    number of transposition table entries
+    """
+    self.evaluate = evaluate
+    self.depth = depth
+    self.beam_width = beam_width
+    # Scratch engine that placements are simulated on
+    self.sim = Engine(board_size, row_height)
+    self.zobrist = Zobrist(board_size)
+    self.table = TranspositionTable(table_size)
+
+  def plan(self, engine, cancelled=None):
+    """
+    Return Plan for the falling pair of an engine, or None if there is no
+    falling pair, every placement ends the game or the search was cancelled.
+    Arguments:
+      engine       Engine to plan for. It isn't changed.
+      cancelled    function returning whether to give up, checked before
+                   each placement is simulated
+    """
+    p = engine.pair
+    if not p or engine.game_over():
+      return None
+    root = (engine.grid.copy(), tuple(engine.tops), self.zobrist.hash(engine.grid))
+    pairs = [(p.code1, p.code2), engine.next_codes][:self.depth]
+    spawn = (self.sim.gen_col, 0, self.sim.gen_col, self.sim.row_height)
+    # (points so far, position, plan for the falling pair)
+    beam = [(0, root, None)]
+    best = None
+    for depth, codes in enumerate(pairs):
+      children = []
+      for points, node, first in beam:
+        start = (p.col1, p.y1, p.col2, p.y2) if depth == 0 else spawn
+        for position, moves in self.placements(node, start):
+          if cancelled and cancelled():
+            return None
+          child = self.place(node, codes, position)
+          if child is self._game_over:
+            continue
+          child_node, gained, cells = child
+          children.append((points + gained, child_node, first or Plan(moves, cells, 0)))
+      # Keep what was found so far if every placement ends the game
+      if not children:
+        break
+      values = self.position_values([child[1] for child in children])
+      ranked = sorted(zip([points + value for (points, node, first), value in zip(children, values)],
+                          range(len(children))), reverse=True)
+      beam = [children[i] for value, i in ranked[:self.beam_width]]
+      best = beam[0][2]._replace(value=ranked[0][0])
+    return best
+
+  def placements(self, node, start):
+    """
+    Return list of (position, moves) for every position of the pair that
+    moves and rotations can reach from start without dropping it, where
+    position is (col1, y1, col2, y2).
+    Arguments:
+      node     (grid, tops, hash) of position
+      start    (col1, y1, col2, y2) of the pair
+    """
+    key = ("placements", node[1], start)
+    found = self.table.get(key)
+    if found is not None:
+      return found
+    # Same checks as Engine.legal and moves as Engine.rotate, straight from
+    # the legal-move table
+    sim = self.sim
+    sim.set_grid(node[0], node[1])
+    limits = sim.move_limits()
+    rh = sim.row_height
+    moves = {start: []}
+    queue = collections.deque([start])
+    while queue:
+      position = queue.popleft()
+      col1, y1, col2, y2 = position
+      if y1 < y2:
+        orientation = ABOVE
+      elif y1 > y2:
+        orientation = BELOW
+      elif col1 > col2:
+        orientation = RIGHT_OF
+      else:
+        orientation = LEFT_OF
+      bottom = max(y1, y2)
+      for move in (LEFT, RIGHT, CW, CCW):
+        if bottom >= limits[move][orientation][col2]:
+          continue
+        if move == LEFT:
+          reached = (col1 - 1, y1, col2 - 1, y2)
+        elif move == RIGHT:
+          reached = (col1 + 1, y1, col2 + 1, y2)
+        else:
+          col, row = rotations[move][orientation]
+          reached = (col1 + col, y1 + row*rh, col2, y2)
+        if reached not in moves:
+          moves[reached] = moves[position] + [move]
+          queue.append(reached)
+    # Positions that land the same way are one placement
+    found = {}
+    for position, path in moves.items():
+      col1, y1, col2, y2 = position
+      landing = (col1, col2, (y1 > y2) - (y1 < y2))
+      if landing not in found or len(path) < len(found[landing][1]):
+        found[landing] = (position, path)
+    found = sorted(found.values())
+    self.table.put(key, found)
+    return found
+
+  def place(self, node, codes, position):
+    """
+    Return (child node, points, cells) of dropping a pair at a position and
+    resolving its chain, or _game_over if it ends the game.
+    Arguments:
+      node        (grid, tops, hash) of position before the drop
+      codes       (code1, code2) of the pair
+      position    (col1, y1, col2, y2) of the pair
+    """
+    col1, y1, col2, y2 = position
+    key = (node[2], codes, col1, col2, (y1 > y2) - (y1 < y2))
+    child = self.table.get(key)
+    if child is not None:
+      return child
+
+    sim = self.sim
+    sim.set_grid(node[0], node[1])
+    sim.score = 0
+    # Lower brick (larger y) lands first, in case they are stacked
+    bricks = [(0, col1, codes[0]), (1, col2, codes[1])]
+    if y1 < y2:
+      bricks.reverse()
+    cells = [None, None]
+    child = None
+    for i, col, code in bricks:
+      row = sim.tops[col] - 1
+      # Over the top is game over here, as in VectorBoard, see Bot
+      if row < 0:
+        child = self._game_over
+        break
+      sim.lock_brick(col, code)
+      cells[i] = (col, row)
+    if child is None:
+      chain = sim.resolve()
+      if sim.spawn_blocked():
+        child = self._game_over
+      else:
+        if chain:
+          h = self.zobrist.hash(sim.grid)
+        else:
+          # Only the two landed cells changed
+          h = node[2]
+          for col, row in cells:
+            h ^= self.zobrist.key(col, row, sim.grid[col, row])
+        child = ((sim.grid.copy(), tuple(sim.tops), h), sim.score, tuple(cells))
+    self.table.put(key, child)
+    return child
+
+  def position_values(self, nodes):
+    """
+    Return list of evaluations of positions. Positions seen before come from
+    the transposition table and the rest are evaluated together.
+    Arguments:
+      nodes    list of (grid, tops, hash) of positions
+    """
+    values = [self.table.get(("value", node[2])) for node in nodes]
+    missing = [i for i, value in enumerate(values) if value is None]
+    if missing:
+      grids = numpy.array([nodes[i][0] for i in missing])
+      tops = numpy.array([nodes[i][1] for i in missing])
+      for i, value in zip(missing, self.evaluate(grids, tops, self.sim.gen_col).tolist()):
+        values[i] = value
+        self.table.put(("value", nodes[i][2]), value)
+    return values
+
+# Engine method called for each bot move
+_move_methods = {LEFT: "move_left", RIGHT: "move_right", CW: "rotate_cw", CCW: "rotate_ccw"}
+
+def check_placements(games, board_size=(6, 15), row_height=32):
+  """
+  Play games with random placements, and check every placement of every
+  pair against the engine: Bot.place must leave the same grid and points as
+  the engine making the same moves, dropping the pair and resolving its
+  chain. Placements that end the game are skipped, as the bot ends them
+  early (see Bot). Print placements checked and return whether all matched.
+  Arguments:
+    games         number of games to play
+    board_size    number of (columns, rows)
+    row_height    engine y units per row
+  """
+  bot = Bot(board_size, row_height, depth=1)
+  engine = Engine(board_size, row_height)
+  sim = Engine(board_size, row_height)
+  choices = random.Random(0)
+  checked = wrong = 0
+  for seed in range(games):
+    engine.start(seed)
+    while not engine.game_over():
+      p = engine.pair
+      if engine.state != "fall" or p is None:
+        engine.update()
+        continue
+      root = (engine.grid.copy(), tuple(engine.tops), bot.zobrist.hash(engine.grid))
+      start = engine.snapshot()
+      found = bot.placements(root, (p.col1, p.y1, p.col2, p.y2))
+      for position, moves in found:
+        child = bot.place(root, (p.code1, p.code2), position)
+        if child is Bot._game_over:
+          continue
+        sim.restore(start)
+        for move in moves:
+          getattr(sim, _move_methods[move])()
+        sim.speed_up()
+        while sim.state == "fall":
+          sim.update()
+        # Resolve the chain
+        sim.update()
+        checked += 1
+        if not (sim.grid == child[0][0]).all() or sim.score - start.score != child[1]:
+          wrong += 1
+          print("seed %d, pair %s at %s: bot and engine differ" % (seed, (p.code1, p.code2), position))
+      # Play on from a random placement
+      for move in choices.choice(found)[1]:
+        getattr(engine, _move_methods[move])()
+      engine.speed_up()
+      while engine.state == "fall":
+        engine.update()
+  print("%d placements checked in %d games, %d differ" % (checked, games, wrong))
+  return wrong == 0
+
+if __name__ == "__main__":
+  sys.exit(0 if check_placements(int(sys.argv[1]) if len(sys.argv) > 1 else 20) else 1)
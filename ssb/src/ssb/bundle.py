@@ -0,0 +1,181 @@
+'''
+Packed asset bundle for Something Something Bricks. Images, sounds and fonts
+are packed into one file with an offset table, which is memory mapped at run
+time. Run this module to build the bundle:
+
+  python bundle.py
+
+Without a bundle, assets are read from their directories next to this module.
+Either way the game runs from any working directory.
+
+Created on Oct 18, 2026
+
+@author: Dan
+'''
+
+import mmap
+import os
+import struct
+import sys
+
+# Directory the game's assets are in. For a frozen build that is the
+# directory of the executable.
+if getattr(sys, "frozen", False):
+  base_dir = os.path.dirname(os.path.abspath(sys.executable))
+else:
+  base_dir = os.path.dirname(os.path.abspath(__file__))
+# Default bundle file
+bundle_path = os.path.join(base_dir, "assets.bundle")
+# Asset directories packed into the bundle
+asset_dirs = ("images", "sounds", "fonts")
+
+## Bundle layout: header, then one index entry per asset, then asset data
+# Magic string and number of assets
+_header = struct.Struct("<4sI")
+_magic = b"SSB1"
+# Asset name ("images/red_brick.png"), offset from start of file and size
+_entry = struct.Struct("<64sQQ")
+
+class AssetFile:
+  """
+  Read-only file object over one asset in the memory mapped bundle. Pygame
+  loaders take it like any open file. They need bytes back from read, so
+  each read copies its chunk out of the mapping once; the asset is never
+  read into memory whole first.
+  """
+
+  def __init__(self, data):
+    """
+    Default constructor.
+    Arguments:
+      data    memoryview of the asset's bytes
+    """
+    self.data = data
+    self.pos = 0
+
+  def read(self, size=-1):
+    """
+    Return up to size bytes from the current position, or the rest if size
+    is negative. The bytes are a copy, since pygame won't take a memoryview.
+    """
+    end = len(self.data) if size is None or size < 0 else min(self.pos + size, len(self.data))
+    chunk = self.data[self.pos:end].tobytes()
+    self.pos = max(end, self.pos)
+    return chunk
+
+  def seek(self, offset, whence=os.SEEK_SET):
+    """
+    Move the current position, as file.seek does. Return the new position.
+    """
+    if whence == os.SEEK_CUR:
+      offset += self.pos
+    elif whence == os.SEEK_END:
+      offset += len(self.data)
+    self.pos = max(offset, 0)
+    return self.pos
+
+  def tell(self):
+    """
+    Return the current position.
+    """
+    return self.pos
+
+  def close(self):
+    """
+    Nothing to close, the bundle stays mapped.
+    """
+    pass
+
+class AssetBundle:
+  """
+  Assets by name ("sounds/drop.wav"), read from the memory mapped bundle file
+  if there is one, or else from the asset directories. The bundle is opened
+  on first use.
+  """
+
+  def __init__(self, path=bundle_path):
+    """
+    Default constructor.
+    Arguments:
+      path    bundle file name
+    """
+    self.path = path
+    # Memory map of the bundle, and (offset, size) of each asset by name
+    self.map = None
+    self.index = None
+
+  def load(self):
+    """
+    Map the bundle file and read its index. With no bundle file the index is
+    left empty and assets are read from their directories.
+    """
+    self.index = {}
+    if not os.path.exists(self.path):
+      return
+    f = open(self.path, "rb")
+    try:
+      self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    finally:
+      # The mapping stays valid after the file is closed
+      f.close()
+    magic, count = _header.unpack_from(self.map, 0)
+    if magic != _magic:
+      raise Exception("Not an asset bundle: %s" % self.path)
+    for i in range(count):
+      name, offset, size = _entry.unpack_from(self.map, _header.size + i*_entry.size)
+      self.index[name.rstrip(b"\0").decode("utf-8")] = (offset, size)
+
+  def open(self, name):
+    """
+    Return a file object for an asset.
+    Arguments:
+      name    asset path relative to the asset directories, such as
+              "images/red_brick.png"
+    """
+    if self.index is None:
+      self.load()
+    if name in self.index:
+      offset, size = self.index[name]
+      return AssetFile(memoryview(self.map)[offset:offset + size])
+    return open(os.path.join(base_dir, name), "rb")
+
+def build(path=bundle_path, root=base_dir):
+  """
+  Pack every file in the asset directories into a bundle file. Return the
+  number of assets packed.
+  Arguments:
+    path    bundle file to write
+    root    directory holding the asset directories
+  """
+  names = []
+  for asset_dir in asset_dirs:
+    for file_name in sorted(os.listdir(os.path.join(root, asset_dir))):
+      if os.path.isfile(os.path.join(root, asset_dir, file_name)):
+        names.append(asset_dir + "/" + file_name)
+
+  # Asset data starts right after the index
+  offset = _header.size + len(names)*_entry.size
+  index = []
+  data = []
+  for name in names:
+    if len(name.encode("utf-8")) > _entry.size - 16:
+      raise Exception("Asset name too long for bundle index: %s" % name)
+    f = open(os.path.join(root, name), "rb")
+    contents = f.read()
+    f.close()
+    index.append(_entry.pack(name.encode("utf-8"), offset, len(contents)))
+    data.append(contents)
+    offset += len(contents)
+
+  f = open(path, "wb")
+  f.write(_header.pack(_magic, len(names)))
+  f.write(b"".join(index))
+  f.write(b"".join(data))
+  f.close()
+  return len(names)
+
+# Bundle shared by everything that loads assets
+bundle = AssetBundle()
+
+if __name__ == "__main__":
+  print("Packed %d assets into %s" % (build(), bundle_path))
@@ -0,0 +1,827 @@
+'''
+Game rules for Something Something Bricks. Has no pygame dependency so it
+can be run headless for simulations, bots and tests.
+
+Created on Oct 18, 2026
+
+@author: Dan
+'''
+
+import collections
+import numpy
+import random
+
+from color import *
+
+## Cell codes
+# Low bits hold the color index (0 is an empty cell), high bits are flags
+EMPTY = 0
+COLOR_MASK = 0x07
+BREAKER = 0x08
+BROKEN = 0x10
+# Array type for a grid of cell codes
+cell_dtype = numpy.uint8
+
+# (R, G, B) triplet for each color index
+colors = [black, red, green, blue, yellow]
+
+## Moves
+LEFT = 0
+RIGHT = 1
+CW = 2
+CCW = 3
+DROP = 4
+
+## Orientations of the first brick of a pair relative to the second
+ABOVE = 0
+RIGHT_OF = 1
+BELOW = 2
+LEFT_OF = 3
+
+# (column, row) change of the first brick for each rotation and orientation
+rotations = {CW: [(1, 1), (-1, 1), (-1, -1), (1, -1)],
+             CCW: [(-1, 1), (-1, -1), (1, -1), (1, 1)]}
+
+# One break and drop step of a chain. depth counts from 1, breakers is the
+# number of breakers that went off, broken lists (col, row) of broken bricks,
+# shifts lists (col, from_row, to_row) of bricks moved down by the drop and
+# score is the points scored by the step.
+ChainStep = collections.namedtuple("ChainStep", "depth breakers broken shifts score")
+
+# Engine state between updates, from Engine.snapshot. grid is the grid's bytes,
+# tops and dirty are the column tops and changed cells, pair is
+# (code1, col1, y1, code2, col2, y2) of the falling pair or None, rng is the
+# random number generator state and chain is a tuple of the last ChainSteps.
+# Every field is immutable, so a snapshot can be kept and restored any number
+# of times.
+Snapshot = collections.namedtuple("Snapshot",
+  "grid tops dirty pair next_codes score fallspeed_slow fallspeed state ticks seed rng chain")
+
+## Grid operations
+# These work on a single [col, row] grid or a stack of grids with any number
+# of leading board dimensions.
+
+def col_tops(grid):
+  """
+  Return array with the row index of the top brick in each column. Empty
+  columns have the number of rows.
+    grid    array of cell codes
+  """
+  filled = grid != EMPTY
+  return numpy.where(filled.any(axis=-1), filled.argmax(axis=-1), grid.shape[-1])
+
+def active_colors(grid):
+  """
+  Return array of color indices of bricks that can still be broken. Broken
+  and empty cells are 0.
+    grid    array of cell codes
+  """
+  return numpy.where(grid & BROKEN, EMPTY, grid & COLOR_MASK)
+
+def same_color_links(active):
+  """
+  Return (horizontal, vertical) boolean arrays marking neighboring cells of
+  the same nonzero color. horizontal[..., c, r] links cells (c, r) and
+  (c+1, r), vertical[..., c, r] links cells (c, r) and (c, r+1).
+    active    array of color indices, as from active_colors
+  """
+  horizontal = (active[..., 1:, :] == active[..., :-1, :]) & (active[..., 1:, :] != EMPTY)
+  vertical = (active[..., 1:] == active[..., :-1]) & (active[..., 1:] != EMPTY)
+  return horizontal, vertical
+
+def same_color_neighbors(active):
+  """
+  Return boolean array marking cells with a 4-neighbor of the same nonzero
+  color.
+    active    array of color indices, as from active_colors
+  """
+  horizontal, vertical = same_color_links(active)
+  match = numpy.zeros(active.shape, dtype=bool)
+  match[..., 1:, :] |= horizontal
+  match[..., :-1, :] |= horizontal
+  match[..., 1:] |= vertical
+  match[..., :-1] |= vertical
+  return match
+
+def triggered_breakers(grid, active):
+  """
+  Return boolean array marking breakers touching a brick of the same color.
+    grid      array of cell codes
+    active    array of color indices, as from active_colors
+  """
+  return (grid & BREAKER).astype(bool) & same_color_neighbors(active)
+
+def grow_regions(region, active):
+  """
+  Return region grown to include every cell connected to it through
+  neighbors of the same color.
+    region    boolean array of seed cells
+    active    array of color indices, as from active_colors
+  """
+  horizontal, vertical = same_color_links(active)
+  # Grow region one step at a time until no more bricks are added
+  while True:
+    grown = region.copy()
+    grown[..., 1:, :] |= region[..., :-1, :] & horizontal
+    grown[..., :-1, :] |= region[..., 1:, :] & horizontal
+    grown[..., 1:] |= region[..., :-1] & vertical
+    grown[..., :-1] |= region[..., 1:] & vertical
+    if (grown == region).all():
+      return region
+    region = grown
+
+def drop_cells(grid):
+  """
+  Fill in empty and broken spaces in place by moving bricks above down.
+    grid    array of cell codes
+  """
+  # Unbroken bricks, which are kept
+  kept = (grid != EMPTY) & ~(grid & BROKEN).astype(bool)
+  # Stable sort of each column so kept bricks sink in order to the bottom
+  order = numpy.argsort(kept, axis=-1, kind="stable")
+  kept = numpy.take_along_axis(kept, order, axis=-1)
+  grid[...] = numpy.where(kept, numpy.take_along_axis(grid, order, axis=-1), EMPTY)
+
+class Pair:
+  """
+  Falling pair of bricks. Positions are stored as a column index and a y offset
+  from the top of the board in sub-row units (row_height units per row).
+  """
+
+  __slots__ = ("code1", "col1", "y1", "code2", "col2", "y2")
+
+  def __init__(self, codes, col, y, row_height):
+    """
+    Default constructor. Bricks are arranged vertically initially.
+    Arguments:
+      codes         (c1, c2) cell codes for first (top) and second brick
+      col           column of both bricks
+      y             y offset of first (top) brick
+      row_height    number of y units per row
+    """
+    self.code1, self.code2 = codes
+    self.col1 = self.col2 = col
+    self.y1 = y
+    self.y2 = y + row_height
+
+  def top_edge(self):
+    """
+    Return top edge of top brick.
+    """
+    return min(self.y1, self.y2)
+
+  def bottom_edge(self):
+    """
+    Return top edge of bottom brick.
+    """
+    return max(self.y1, self.y2)
+
+  def orientation(self):
+    """
+    Return orientation (ABOVE, RIGHT_OF, BELOW or LEFT_OF) of first brick
+    relative to second.
+    """
+    if self.y1 < self.y2:
+      return ABOVE
+    elif self.y1 > self.y2:
+      return BELOW
+    elif self.col1 > self.col2:
+      return RIGHT_OF
+    return LEFT_OF
+
+  def left_col(self):
+    """
+    Return column of left brick.
+    """
+    return min(self.col1, self.col2)
+
+  def right_col(self):
+    """
+    Return column of right brick.
+    """
+    return max(self.col1, self.col2)
+
+class Engine:
+  """
+  Rules engine for one play area: spawning, moving, rotating, falling, locking,
+  breaking and dropping bricks.
+  """
+
+  # Number of brick colors
+  _num_colors = 4
+
+  # Brick fallspeed (y units per update)
+  _fallspeed_fast = 10
+
+  # Probability of getting a breaker brick
+  _breaker_prob = 0.20
+
+  # Points scored per step up in the slow fallspeed
+  _points_per_speed = 200
+
+  # Move limits for moves that are always or never legal
+  _always = 1 << 30
+  _never = -(1 << 30)
+
+  def __init__(self, board_size, row_height=32, debug=False):
+    """
+    Default constructor.
+    Arguments:
+      board_size    number of (columns, rows)
+      row_height    number of y units per row. Fallspeeds are in these units.
+      debug         check that incremental break detection matches a scan
+                    of the whole board
+    """
+    # Save parameters
+    self.num_cols, self.num_rows = self.board_size = board_size
+    self.row_height = row_height
+    # Column where bricks are spawned (0 indexed)
+    self.gen_col = self.num_cols // 2
+    # Max possible y for brick top edge
+    self.max_y = self.row_height * (self.num_rows - 1)
+
+    # Events (such as "lock" and "break") raised during the last update
+    self.events = []
+    # Steps of the last chain, as returned by resolve
+    self.chain = []
+    # Queue for spreading breaks, one slot per cell so it never grows
+    self._break_queue = [0] * (self.num_cols * self.num_rows)
+    self.debug = debug
+    # Random number generator for new bricks, seeded by start so a game can
+    # be replayed from its seed and inputs
+    self.random = random.Random()
+    self.seed = None
+
+    # Create array of stacked bricks
+    self.clear_board()
+
+    # Current dropping brick pair
+    self.pair = None
+    # Generate next brick placeholder
+    self.gen_next()
+
+  def gen_breaker(self):
+    """
+    Return true with probability _breaker_prob to determine whether
+    a breaker brick is generated.
+    """
+    return self.random.random() < self._breaker_prob
+
+  def gen_code(self):
+    """
+    Return a random cell code for a newly generated brick.
+    """
+    code = self.random.randint(1, self._num_colors)
+    if self.gen_breaker():
+      code |= BREAKER
+    return code
+
+  def gen_next(self):
+    """
+    Generate cell codes for next brick.
+    """
+    self.next_codes = (self.gen_code(), self.gen_code())
+
+  def start(self, seed=None):
+    """
+    Reset game state and start new game.
+    Arguments:
+      seed    seed for this game's bricks. Default is a random seed.
+    """
+    if seed is None:
+      seed = random.getrandbits(32)
+    self.seed = seed
+    self.random.seed(seed)
+    self.gen_next()
+    # Reset game board
+    self.clear_board()
+    # Drop a new brick
+    self.create_brick()
+
+  def clear_board(self):
+    """
+    Reset game board to all blank cells and reset all state.
+    """
+    # Blank all brick spaces. Indexed by [col, row], row 0 is the top.
+    self.grid = numpy.zeros(self.board_size, dtype=cell_dtype)
+    # Flat indices (col*num_rows + row) of cells changed since the last break
+    # check. Breaks can only start at or next to these cells.
+    self.dirty = set()
+    # Lowest broken row of each column with bricks broken but not dropped
+    self.broken_low = {}
+    # Row index of the top brick of each column, num_rows if empty
+    self.tops = [self.num_rows]*self.num_cols
+    # Legal-move table, rebuilt from tops when needed
+    self._move_limits = None
+    # Reset fallspeed
+    self.fallspeed_slow = 1
+    self.fallspeed = self.fallspeed_slow
+    # Reset score
+    self.score = 0
+    # Number of updates since the start, used to time replay inputs
+    self.ticks = 0
+    # Start state is falling brick
+    self.state = "fall"
+
+  def create_brick(self):
+    """
+    Create a new dropping brick.
+    """
+    self.pair = Pair(self.next_codes, self.gen_col, 0, self.row_height)
+    # Determine next brick colors and breaker status
+    self.gen_next()
+
+  def col_top(self, col):
+    """
+    Return row index of the top brick in column col that is not empty, or
+    None if the column is empty.
+    Arguments:
+      col    column to return top brick of.
+    """
+    row = self.tops[col]
+    if row < self.num_rows:
+      return row
+    # If no brick's found
+    return None
+
+  def col_y_top(self, col):
+    """
+    Return y of first (bottom) brick space in column col that is empty.
+    Arguments:
+      col    column to return top y of.
+    """
+    # Empty columns give the bottom edge
+    return (self.tops[col] - 1) * self.row_height
+
+  def move_limits(self):
+    """
+    Return the legal-move table. move_limits()[move][orientation][col] is the
+    y that the bottom edge of a pair must be above for the move to be legal,
+    where col is the column of the second brick. The table is rebuilt only
+    after column tops change.
+    """
+    if self._move_limits is None:
+      self._move_limits = self.build_move_limits()
+    return self._move_limits
+
+  def build_move_limits(self):
+    """
+    Build the legal-move table from the column tops. See move_limits.
+    """
+    rh = self.row_height
+    never = self._never
+    last_col = self.num_cols - 1
+    col_y_tops = [(top - 1) * rh for top in self.tops]
+
+    def at(col):
+      # Empty space of column, or never for columns off the board
+      if 0 <= col <= last_col:
+        return col_y_tops[col]
+      return never
+
+    limits = [[[never]*self.num_cols for orientation in range(4)] for move in range(4)]
+    for col in range(self.num_cols):
+      # Both bricks in column col
+      for orientation in (ABOVE, BELOW):
+        limits[LEFT][orientation][col] = at(col - 1)
+        limits[RIGHT][orientation][col] = at(col + 1)
+      # First brick in column col + 1
+      limits[LEFT][RIGHT_OF][col] = min(at(col), at(col - 1))
+      limits[RIGHT][RIGHT_OF][col] = min(at(col + 2), at(col + 1))
+      # First brick in column col - 1
+      limits[LEFT][LEFT_OF][col] = min(at(col - 2), at(col - 1))
+      limits[RIGHT][LEFT_OF][col] = min(at(col), at(col + 1))
+      # Rotations, where the first brick swings into a neighboring column
+      limits[CW][ABOVE][col] = at(col + 1)
+      limits[CW][BELOW][col] = at(col - 1) + rh
+      limits[CW][RIGHT_OF][col] = at(col) - rh
+      limits[CW][LEFT_OF][col] = self._always
+      limits[CCW][ABOVE][col] = at(col - 1)
+      limits[CCW][BELOW][col] = at(col + 1) + rh
+      limits[CCW][RIGHT_OF][col] = self._always
+      limits[CCW][LEFT_OF][col] = at(col) - rh
+    return limits
+
+  def legal(self, move):
+    """
+    Return whether move (LEFT, RIGHT, CW or CCW) is legal for the dropping brick.
+    Arguments:
+      move    move to check
+    """
+    p = self.pair
+    if not p or self.game_over():
+      return False
+    return p.bottom_edge() < self.move_limits()[move][p.orientation()][p.col2]
+
+  def legal_moves(self):
+    """
+    Return list of moves (LEFT, RIGHT, CW, CCW) legal for the dropping brick.
+    """
+    return [move for move in (LEFT, RIGHT, CW, CCW) if self.legal(move)]
+
+  def move_left(self):
+    """
+    Move dropping brick to the left. Return whether the brick moved.
+    """
+    if self.legal(LEFT):
+      self.pair.col1 -= 1
+      self.pair.col2 -= 1
+      return True
+    return False
+
+  def move_right(self):
+    """
+    Move dropping brick to the right. Return whether the brick moved.
+    """
+    if self.legal(RIGHT):
+      self.pair.col1 += 1
+      self.pair.col2 += 1
+      return True
+    return False
+
+  def rotate(self, move):
+    """
+    Rotate first (originally top) brick around second brick. Return whether
+    the brick rotated.
+    Arguments:
+      move    CW or CCW
+    """
+    if self.legal(move):
+      p = self.pair
+      col, row = rotations[move][p.orientation()]
+      p.col1 += col
+      p.y1 += row * self.row_height
+      return True
+    return False
+
+  def rotate_cw(self):
+    """
+    Rotate first (originally top) brick clockwise around second brick. Return
+    whether the brick rotated.
+    """
+    return self.rotate(CW)
+
+  def rotate_ccw(self):
+    """
+    Rotate first (originally top) brick counter-clockwise around second brick.
+    Return whether the brick rotated.
+    """
+    return self.rotate(CCW)
+
+  def speed_up(self):
+    """
+    Increase fallspeed to fast.
+    """
+    if not self.game_over():
+      self.fallspeed = self._fallspeed_fast
+
+  def slow_down(self):
+    """
+    Decrease fallspeed to slow.
+    """
+    if not self.game_over():
+      self.fallspeed = self.fallspeed_slow
+
+  def update(self):
+    """
+    Advance the game by one step. Drops the brick by fallspeed, and once the
+    bottom is reached, handles breaking and spawns a new brick.
+    """
+    # Events are only kept for a single update
+    del self.events[:]
+    self.ticks += 1
+
+    # Handle the whole chain of breaks at once
+    if self.state == "break":
+      self.chain = self.resolve()
+
+    # Create new brick after breaking
+    elif self.state == "new_brick":
+      # Create new brick if the game is not over
+      if not self.spawn_blocked():
+        self.create_brick()
+        # Go back to dropping brick
+        self.state = "fall"
+      else:
+        # If the game is over because another spawned brick cannot fall,
+        # still create a new one
+        if self.grid[self.gen_col, 1] == EMPTY:
+          self.create_brick()
+        # Game state is set to game over
+        self.state = "game_over"
+
+    # Update falling brick
+    elif self.state == "fall":
+      p = self.pair
+      fallspeed = self.fallspeed
+      # If the brick pair hasn't reached the bottom,
+      if p.y1 < self.col_y_top(p.col1) - fallspeed and \
+        p.y2 < self.col_y_top(p.col2) - fallspeed:
+        # Drop bricks
+        p.y1 += fallspeed
+        p.y2 += fallspeed
+      # Else one of the bricks has reached the top of a column
+      # In this case, both bricks are dropped
+      else:
+        self.events.append("lock")
+        # Brick that hits a surface first needs to handled first (in case stacked)
+        if p.y2 >= self.col_y_top(p.col2) - fallspeed:
+          self.lock_brick(p.col2, p.code2)
+          self.lock_brick(p.col1, p.code1)
+        else:
+          self.lock_brick(p.col1, p.code1)
+          self.lock_brick(p.col2, p.code2)
+        # Remove dropping brick while handling break
+        self.pair = None
+        # Next, handle any breaking of bricks
+        self.state = "break"
+
+    elif self.state == "game_over":
+      pass
+    else:
+      raise Exception("Unknown state in game engine.")
+
+  def resolve(self):
+    """
+    Break and drop bricks until no breaker touches a brick of its color, then
+    get ready for a new brick. Return list of ChainStep, one per step of the
+    chain, so a renderer can animate it afterwards.
+    """
+    chain = []
+    while True:
+      events = len(self.events)
+      score = self.score
+      broken = self.break_bricks()
+      if not broken:
+        break
+      # Collapse bricks from above, then rerun breaking to find combos
+      shifts = self.drop_bricks()
+      chain.append(ChainStep(len(chain) + 1, len(self.events) - events,
+                             broken, shifts, self.score - score))
+
+    # Fall speed increases as points are scored
+    self.fallspeed_slow = self.score // self._points_per_speed + 1
+    self.fallspeed = self.fallspeed_slow
+    # Create a new brick after all breaks have occurred
+    self.state = "new_brick"
+    return chain
+
+  def lock_brick(self, col, code):
+    """
+    Place a brick on top of the stack in column col.
+    Arguments:
+      col     column to place brick in
+      code    cell code of brick
+    """
+    row = self.tops[col] - 1
+    self.grid[col, row] = code
+    self.dirty.add(col*self.num_rows + row % self.num_rows)
+    # A brick placed above the top overwrites the bottom, so the top stays
+    if row >= 0:
+      self.tops[col] = row
+      self._move_limits = None
+
+  def set_grid(self, grid, tops=None):
+    """
+    Replace the stacked bricks with a settled grid, one with no breaks
+    pending, such as a grid between updates.
+    Arguments:
+      grid    array of cell codes of the board's size
+      tops    column tops of grid. Computed if not given.
+    """
+    self.grid[:] = grid
+    self.tops = list(tops) if tops is not None else col_tops(self.grid).tolist()
+    self.dirty = set()
+    self.broken_low = {}
+    self._move_limits = None
+
+  def spawn_blocked(self):
+    """
+    Return whether a new brick can't be spawned because the spawn cells of
+    the spawn column are taken.
+    """
+    return self.grid[self.gen_col, 1:3].any()
+
+  def break_candidates(self):
+    """
+    Return sorted flat indices of breakers touching a brick with the same
+    color. Only cells at or next to dirty cells are checked, since the board
+    had no such breakers before they changed.
+    """
+    flat = self.grid.reshape(-1)
+    num_rows = self.num_rows
+    num_cells = flat.size
+    # Mask for comparing colors so broken bricks never match
+    unbroken = COLOR_MASK | BROKEN
+    checked = set()
+    candidates = []
+    for dirty in self.dirty:
+      for cell in (dirty, dirty - num_rows, dirty + num_rows, dirty - 1, dirty + 1):
+        if cell < 0 or cell >= num_cells or cell in checked:
+          continue
+        # Up and down neighbors must be in the same column
+        if (cell == dirty - 1 and dirty % num_rows == 0) or \
+          (cell == dirty + 1 and cell % num_rows == 0):
+          continue
+        checked.add(cell)
+        code = flat.item(cell)
+        if not code & BREAKER or code & BROKEN:
+          continue
+        color = code & COLOR_MASK
+        row = cell % num_rows
+        if (cell >= num_rows and flat.item(cell - num_rows) & unbroken == color) or \
+          (cell + num_rows < num_cells and flat.item(cell + num_rows) & unbroken == color) or \
+          (row > 0 and flat.item(cell - 1) & unbroken == color) or \
+          (row < num_rows - 1 and flat.item(cell + 1) & unbroken == color):
+          candidates.append(cell)
+    candidates.sort()
+    return candidates
+
+  def break_bricks(self):
+    """
+    Mark as broken every brick connected to a breaker touching a brick with
+    the same color. Return list of (col, row) of broken bricks.
+    """
+    candidates = self.break_candidates()
+    if self.debug:
+      # Compare with a scan of the whole board
+      grid = self.grid
+      scan = numpy.flatnonzero(triggered_breakers(grid, active_colors(grid)))
+      if scan.tolist() != candidates:
+        raise Exception("Incremental break check missed or added breakers.")
+    self.dirty.clear()
+
+    flat = self.grid.reshape(-1)
+    broken = []
+    for cell in candidates:
+      # Skip breakers already broken by an earlier breaker
+      if flat.item(cell) & BROKEN:
+        continue
+      broken += self.spread_break(cell // self.num_rows, cell % self.num_rows)
+      self.events.append("break")
+
+    return broken
+
+  def spread_break(self, col, row):
+    """
+    Break the region of same colored bricks connected to col, row. Cells are
+    visited at most once using a preallocated queue instead of recursion.
+    Return list of (col, row) of broken bricks.
+    Arguments:
+      col       Column index to spread break
+      row       Row index to spread break
+    """
+    flat = self.grid.reshape(-1)
+    num_rows = self.num_rows
+    num_cells = flat.size
+    # Mask for comparing colors so broken bricks never match
+    unbroken = COLOR_MASK | BROKEN
+    queue = self._break_queue
+    start = col*num_rows + row
+    color = flat.item(start) & COLOR_MASK
+    # Cells are marked broken when queued so they are never queued twice.
+    # Their colors are kept for the broken graphic.
+    broken = color | BROKEN
+    flat[start] = broken
+    queue[0] = start
+    head, tail = 0, 1
+    while head < tail:
+      cell = queue[head]
+      head += 1
+      row = cell % num_rows
+      # Spread to surrounding bricks of the same color
+      if cell >= num_rows and flat.item(cell - num_rows) & unbroken == color:
+        flat[cell - num_rows] = broken
+        queue[tail] = cell - num_rows
+        tail += 1
+      if cell + num_rows < num_cells and flat.item(cell + num_rows) & unbroken == color:
+        flat[cell + num_rows] = broken
+        queue[tail] = cell + num_rows
+        tail += 1
+      if row > 0 and flat.item(cell - 1) & unbroken == color:
+        flat[cell - 1] = broken
+        queue[tail] = cell - 1
+        tail += 1
+      if row < num_rows - 1 and flat.item(cell + 1) & unbroken == color:
+        flat[cell + 1] = broken
+        queue[tail] = cell + 1
+        tail += 1
+
+    # Remember lowest broken row of each column for dropping
+    broken_low = self.broken_low
+    region = [divmod(cell, num_rows) for cell in queue[:tail]]
+    for col, row in region:
+      if broken_low.get(col, -1) < row:
+        broken_low[col] = row
+    # Increment score for each brick destroyed
+    self.score += 10 * tail
+    return region
+
+  def drop_bricks(self):
+    """
+    Fill in any empty spaces by moving bricks above down. Only columns with
+    broken bricks are touched, and moved bricks are marked dirty. Return list
+    of (col, from_row, to_row) of moved bricks.
+    """
+    num_rows = self.num_rows
+    shifts = []
+    for col, low in sorted(self.broken_low.items()):
+      # Part of column down to the lowest broken brick
+      segment = self.grid[col, :low + 1]
+      before = segment.tolist()
+      # Keep rows of unbroken bricks in order, pushed to the bottom
+      kept = [row for row, code in enumerate(before) if code != EMPTY and not code & BROKEN]
+      top = low + 1 - len(kept)
+      segment[:] = [EMPTY]*top + [before[row] for row in kept]
+      for to_row, from_row in enumerate(kept, top):
+        if to_row != from_row:
+          shifts.append((col, from_row, to_row))
+          self.dirty.add(col*num_rows + to_row)
+      # Bricks below the lowest broken one are stacked without gaps
+      self.tops[col] = top
+    self.broken_low.clear()
+    self._move_limits = None
+    return shifts
+
+  def game_over(self):
+    """
+    Return whether the game is over.
+    """
+    return self.state == "game_over"
+
+  def snapshot(self):
+    """
+    Return Snapshot of the game state, to go back to with restore. Take
+    snapshots between updates.
+    """
+    p = self.pair
+    return Snapshot(self.grid.tobytes(), tuple(self.tops), frozenset(self.dirty),
+                    (p.code1, p.col1, p.y1, p.code2, p.col2, p.y2) if p else None,
+                    self.next_codes, self.score, self.fallspeed_slow, self.fallspeed,
+                    self.state, self.ticks, self.seed, self.random.getstate(), tuple(self.chain))
+
+  def restore(self, snap):
+    """
+    Put the game back in the state of a snapshot from an engine of the same
+    board size.
+    Arguments:
+      snap    Snapshot from snapshot
+    """
+    self.grid[:] = numpy.frombuffer(snap.grid, cell_dtype).reshape(self.board_size)
+    self.tops = list(snap.tops)
+    self.dirty = set(snap.dirty)
+    self.broken_low = {}
+    self._move_limits = None
+    self.pair = None
+    if snap.pair:
+      code1, col1, y1, code2, col2, y2 = snap.pair
+      self.pair = p = Pair((code1, code2), col1, y1, self.row_height)
+      p.col2, p.y2 = col2, y2
+    self.next_codes = snap.next_codes
+    self.score = snap.score
+    self.fallspeed_slow = snap.fallspeed_slow
+    self.fallspeed = snap.fallspeed
+    self.state = snap.state
+    self.ticks = snap.ticks
+    self.seed = snap.seed
+    self.random.setstate(snap.rng)
+    self.chain = list(snap.chain)
+    del self.events[:]
+
+class UndoStack:
+  """
+  Stack of snapshots of an engine, for taking back moves. The oldest are
+  dropped once it is full.
+  """
+
+  def __init__(self, engine, max_size=256):
+    """
+    Default constructor.
+    Arguments:
+      engine      Engine to take snapshots of
+      max_size    most snapshots kept
+    """
+    self.engine = engine
+    self.snapshots = collections.deque(maxlen=max_size)
+
+  def push(self):
+    """
+    Save the engine's current state.
+    """
+    self.snapshots.append(self.engine.snapshot())
+
+  def undo(self):
+    """
+    Put the engine back in the last saved state and drop it from the stack.
+    Return whether there was a state to go back to.
+    """
+    if not self.snapshots:
+      return False
+    self.engine.restore(self.snapshots.pop())
+    return True
+
+  def clear(self):
+    """
+    Drop all saved states.
+    """
+    self.snapshots.clear()
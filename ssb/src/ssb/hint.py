@@ -0,0 +1,97 @@
+'''
+Placement hints for Something Something Bricks. A worker thread runs the bot
+on each new pair while the game keeps running, and the board draws the
+latest finished plan as a ghost of where the pair could go.
+
+Created on Oct 18, 2026
+
+@author: Dan
+'''
+
+import threading
+import time
+
+from bot import Bot
+from engine import Engine
+
+class HintWorker:
+  """
+  Searches for a placement of the falling pair on a worker thread. Each new
+  search cancels the one running, and only the plan for the latest search
+  is handed out. The main loop only takes a snapshot of the engine and reads
+  a finished result, so it never waits on the search.
+  """
+
+  def __init__(self, board_size, row_height=32, **bot_args):
+    """
+    Default constructor. The thread is started on the first search.
+    Arguments:
+      board_size    number of (columns, rows)
+      row_height    engine y units per row
+      bot_args      keyword arguments for the Bot, such as depth
+    """
+    self.bot = Bot(board_size, row_height, **bot_args)
+    # Engine the search is run on, restored from a snapshot of the game's
+    self.engine = Engine(board_size, row_height)
+    # Number of the latest search, and its snapshot until the worker takes it
+    self.generation = 0
+    self.request = None
+    self.wake = threading.Condition()
+    # (generation, plan) of the last finished search
+    self.result = None
+    # Seconds taken by the last finished search, for tuning
+    self.search_time = 0.0
+    self.thread = None
+
+  def search(self, engine):
+    """
+    Start a search for a placement of an engine's falling pair, cancelling
+    the search running.
+    Arguments:
+      engine    Engine of the game, between updates
+    """
+    snap = engine.snapshot()
+    with self.wake:
+      self.generation += 1
+      self.request = (self.generation, snap)
+      self.wake.notify()
+    if self.thread is None:
+      # Daemon, so quitting the game doesn't wait on a search
+      self.thread = threading.Thread(target=self.run, name="hint")
+      self.thread.daemon = True
+      self.thread.start()
+
+  def cancel(self):
+    """
+    Cancel the search running, if any, and drop the last plan.
+    """
+    with self.wake:
+      self.generation += 1
+      self.request = None
+
+  def plan(self):
+    """
+    Return Plan of the latest search if it has finished, otherwise None.
+    """
+    # One read of the tuple, which the worker replaces whole
+    result = self.result
+    if result and result[0] == self.generation:
+      return result[1]
+    return None
+
+  def run(self):
+    """
+    Worker thread: wait for a search and run it until cancelled.
+    """
+    while True:
+      with self.wake:
+        while self.request is None:
+          self.wake.wait()
+        generation, snap = self.request
+        self.request = None
+      start = time.perf_counter()
+      self.engine.restore(snap)
+      plan = self.bot.plan(self.engine, lambda: self.generation != generation)
+      if generation == self.generation:
+        self.result = (generation, plan)
+        self.search_time = time.perf_counter() - start
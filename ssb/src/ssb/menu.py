@@ -8,12 +8,16 @@ Created on Dec 27, 2011
 
 import pygame
 
+from audio import sound_queue
+from bundle import bundle
 from color import *
+from text import text_cache
 
 class Menu:
   
-  # Directory where fonts are kept
-  _fonts_dir = "fonts/"
+  # Font sizes for menu items and for instructions
+  _font_size = 20
+  _control_font_size = 14
   
   def __init__(self, topleft = (0, 0), mixer=None):
     """
@@ -27,13 +31,15 @@ class Menu:
     self.linespacing = 30
     # Which item is selected
     self.selected = "Play"
+    # Which item the cursor was last drawn at, for finding dirty rectangles
+    self.drawn_selected = self.selected
     
     # Add sounds
     if mixer:
-      # Directory where sounds are kept
+      # Directory in the asset bundle where sounds are kept
       snd_dir = "sounds/"
       # Sound for key press
-      self.snd_key = mixer.Sound(snd_dir + "select.wav")
+      self.snd_key = mixer.Sound(bundle.open(snd_dir + "select.wav"))
       self.snd_key.set_volume(0.1)
   
   def draw_menu(self, surface):
@@ -41,42 +47,63 @@ class Menu:
     Draw menu to the passed surface starting at the topleft corner passed.
       surface    Surface to draw menu to.
     """
-    font_obj = pygame.font.Font(self._fonts_dir + "OpenSans-Regular.ttf", 20)
     topleft = [self.left + 5, self.top]
-    self.print_surface("Play", surface, topleft, font_obj)
+    self.print_surface("Play", surface, topleft, self._font_size)
     topleft[1] += self.linespacing
-    self.print_surface("Exit", surface, topleft, font_obj)
+    self.print_surface("Exit", surface, topleft, self._font_size)
     # Draw selection cursor
-    if self.selected == "Play":
-      pygame.draw.rect(surface, white, pygame.rect.Rect(self.topleft, (100, self.linespacing)), 2)
-    elif self.selected == "Exit":
-      pygame.draw.rect(surface, white, pygame.rect.Rect((self.left, self.top + self.linespacing), (100, self.linespacing)), 2)
-    else:
-      raise Exception("Unknown menu state.")
+    pygame.draw.rect(surface, white, self.cursor_rect(self.selected), 2)
     # Print instructions
     control_linespacing = 18
-    font_obj = pygame.font.Font(self._fonts_dir + "OpenSans-Regular.ttf", 14)
+    control_size = self._control_font_size
     topleft[1] += 2*self.linespacing
-    self.print_surface("Z, X to rotate", surface, topleft, font_obj)
+    self.print_surface("Z, X to rotate", surface, topleft, control_size)
     topleft[1] += control_linespacing
-    self.print_surface("Arrow keys to move", surface, topleft, font_obj)
+    self.print_surface("Arrow keys to move", surface, topleft, control_size)
     topleft[1] += control_linespacing
-    self.print_surface("M to mute", surface, topleft, font_obj)
+    self.print_surface("M to mute", surface, topleft, control_size)
     topleft[1] += control_linespacing
-    self.print_surface("Esc to quit", surface, topleft, font_obj)
+    self.print_surface("H for hint", surface, topleft, control_size)
+    topleft[1] += control_linespacing
+    self.print_surface("Esc to quit", surface, topleft, control_size)
     
     # Draw rectangle around everything
     topleft = (self.topleft[0] - 8, self.topleft[1] - 8)
-    size = (160, 180)
+    size = (160, 198)
     pygame.draw.rect(surface, gray, pygame.Rect(topleft, size), 2)
     
+  def cursor_rect(self, selected):
+    """
+    Return rect of selection cursor when item selected is selected.
+      selected    "Play" or "Exit"
+    """
+    if selected == "Play":
+      return pygame.rect.Rect(self.topleft, (100, self.linespacing))
+    elif selected == "Exit":
+      return pygame.rect.Rect((self.left, self.top + self.linespacing), (100, self.linespacing))
+    else:
+      raise Exception("Unknown menu state.")
+  
+  def dirty_rects(self):
+    """
+    Return list of rects whose drawing changed since the last call: the old
+    and new cursor when the selection moved.
+    """
+    if self.selected == self.drawn_selected:
+      return []
+    # Grown to cover the cursor outline
+    rects = [self.cursor_rect(self.drawn_selected).inflate(4, 4),
+             self.cursor_rect(self.selected).inflate(4, 4)]
+    self.drawn_selected = self.selected
+    return rects
+    
   def menu_up(self):
     """
     Move up in the menu selections.
     """
     if self.selected == "Exit":
       self.selected = "Play"
-      self.snd_key.play()
+      sound_queue.play(self.snd_key)
     
   
   def menu_down(self):
@@ -85,21 +112,16 @@ class Menu:
     """
     if self.selected == "Play":
       self.selected = "Exit"
-      self.snd_key.play()
+      sound_queue.play(self.snd_key)
 
-  def print_surface(self, msg, surface, topleft, font_obj):
+  def print_surface(self, msg, surface, topleft, size):
     """
     Print the passed msg string to the surface at location specified by topleft.
     Arguments
       msg        String to be displayed.
       surface    Pygame surface to print string to.
       topleft    (x, y) top left corner of location to print to.
-      font_obj   Pygame font object for text rendering.
+      size       Font size for text rendering.
     """
-    # Surface containing game over text
-    # Do not anti-alias, render in white
-    msg_surface = font_obj.render(msg, True, white)
-    # Create rect object to specify where to place text
-    msg_rect = msg_surface.get_rect()
-    msg_rect.topleft = topleft
-    surface.blit(msg_surface, msg_rect)
\ No newline at end of file
+    # Rendered in white once, then reused from the text cache
+    surface.blit(text_cache.render(msg, size), topleft)
\ No newline at end of file
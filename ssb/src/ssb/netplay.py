@@ -0,0 +1,387 @@
+'''
+Versus play over UDP for Something Something Bricks. Each side simulates
+both boards from the same seed and sends only its inputs. Local inputs are
+delayed a few updates to give them time to arrive; when a remote input
+still comes late, both engines are rolled back to a snapshot from before it
+and the updates since are simulated again, all within one frame.
+
+Run this module to play two sessions with random inputs against each other
+over loopback with simulated lag and packet loss, and check they agree:
+
+  python netplay.py [UPDATES] [LAG]    LAG is the most lag in milliseconds
+
+Created on Oct 18, 2026
+
+@author: Dan
+'''
+
+import random
+import socket
+import struct
+import sys
+import time
+
+from engine import Engine
+from replay import input_names
+
+## Packets. Inputs of an update are a bitmask of replay inputs (1 << MOVE_LEFT
+## and so on), one byte per update.
+# Hello: type, player number, seed. Sent until the other side answers.
+_hello = struct.Struct("<BBI")
+HELLO = 0
+# Inputs: type, player number, updates of the other player's inputs
+# received so far, update of the first input, number of inputs. Followed by
+# the inputs, every one the other side hasn't acknowledged yet.
+_inputs = struct.Struct("<BBIIB")
+INPUTS = 1
+# Most inputs sent in one packet
+_max_inputs = 255
+# Seconds between hellos while waiting for the other side
+_hello_interval = 0.1
+
+def open_socket(port, host="0.0.0.0"):
+  """
+  Return non-blocking UDP socket bound to a local port.
+  Arguments:
+    port    local port, 0 for any free port
+    host    local address to bind to
+  """
+  sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+  sock.bind((host, port))
+  sock.setblocking(False)
+  return sock
+
+class VersusSession:
+  """
+  Two engines, one per player, advanced in lockstep from the inputs of both
+  players. Remote inputs that haven't arrived yet are predicted to be
+  nothing, and corrected by rollback when they arrive. Engines only advance
+  while the remote inputs are at most max_rollback updates behind, so a
+  rollback is never longer than that. Once a board tops out, neither engine
+  advances further, so both sides end at the same update once their inputs
+  are known.
+  """
+
+  def __init__(self, board_size, row_height, player, sock, remote, seed=None, input_delay=2,
+               max_rollback=8):
+    """
+    Default constructor. Engines are started once the other side answers
+    the hello.
+    Arguments:
+      board_size      number of (columns, rows)
+      row_height      engine y units per row
+      player          0 or 1, which engine is played here. Player 0's seed
+                      is used.
+      sock            non-blocking UDP socket from open_socket
+      remote          (host, port) address of the other side
+      seed            seed for the bricks if player 0. Default is random.
+      input_delay     updates between a local input and the update it is
+                      applied at
+      max_rollback    most updates simulated ahead of the remote inputs
+    """
+    self.engines = [Engine(board_size, row_height), Engine(board_size, row_height)]
+    self.player = player
+    self.sock = sock
+    self.remote = remote
+    self.seed = seed if seed is not None else random.getrandbits(32)
+    self.input_delay = input_delay
+    self.max_rollback = max_rollback
+    # Whether the other side has answered and the engines have started
+    self.started = False
+    self.last_hello = 0.0
+    # Updates simulated so far
+    self.tick = 0
+    # Input bitmasks of each player, by update
+    self.inputs = [{}, {}]
+    # Updates of remote inputs received so far, with none missing, and
+    # updates of local inputs the other side has received
+    self.confirmed = 0
+    self.acked = 0
+    # State of both engines before each of the last updates, by update
+    self.snapshots = {}
+    # Updates simulated again by the last rollback, and most so far
+    self.rollback = 0
+    self.max_rollback_seen = 0
+    # Updates simulated when a board first topped out, or None. Set from
+    # predicted inputs, so a rollback clears it.
+    self.end_tick = None
+
+  def local(self):
+    """
+    Return the engine played here.
+    """
+    return self.engines[self.player]
+
+  def press(self, action):
+    """
+    Add a local input, to be applied input_delay updates from now.
+    Arguments:
+      action    replay input, such as MOVE_LEFT
+    """
+    tick = self.tick + self.input_delay
+    self.inputs[self.player][tick] = self.inputs[self.player].get(tick, 0) | 1 << action
+
+  def advance(self, updates):
+    """
+    Take in packets from the other side, roll back if a remote input
+    differed from its prediction, run up to updates updates and send the
+    local inputs. Call once per frame.
+    Arguments:
+      updates    number of updates due, as from FixedTimestep.advance
+    """
+    self.rollback = 0
+    first_wrong = self.receive()
+    if not self.started:
+      if time.time() - self.last_hello >= _hello_interval:
+        self.send_hello()
+      return
+    if first_wrong is not None:
+      self.roll_back(first_wrong)
+    for update in range(updates):
+      # Wait for the other side rather than get too far ahead of it, and
+      # stop once a board has topped out
+      if self.tick - self.confirmed >= self.max_rollback or self.end_tick is not None:
+        break
+      self.snapshots[self.tick] = (self.engines[0].snapshot(), self.engines[1].snapshot())
+      self.snapshots.pop(self.tick - self.max_rollback - 1, None)
+      self.step(self.tick)
+      self.tick += 1
+    self.send_inputs()
+    # Drop inputs too old to roll back to, keeping local ones until the
+    # other side has them
+    oldest = self.tick - self.max_rollback
+    for inputs, keep in ((self.inputs[self.player], min(oldest, self.acked)),
+                         (self.inputs[1 - self.player], oldest)):
+      for tick in [tick for tick in inputs if tick < keep]:
+        del inputs[tick]
+
+  def step(self, tick):
+    """
+    Apply both players' inputs of an update and advance both engines, with
+    no drawing or sound.
+    Arguments:
+      tick    update to run, the engines' current one
+    """
+    for engine, inputs in zip(self.engines, self.inputs):
+      mask = inputs.get(tick, 0)
+      action = 0
+      while mask:
+        if mask & 1:
+          getattr(engine, input_names[action])()
+        mask >>= 1
+        action += 1
+      engine.update()
+    if self.end_tick is None and (self.engines[0].game_over() or self.engines[1].game_over()):
+      self.end_tick = tick + 1
+
+  def roll_back(self, tick):
+    """
+    Put both engines back to their state before an update and simulate the
+    updates since again with the inputs now known.
+    Arguments:
+      tick    first update whose inputs changed
+    """
+    snaps = self.snapshots[tick]
+    self.engines[0].restore(snaps[0])
+    self.engines[1].restore(snaps[1])
+    # Engines never run past the end, so the end was after tick and may
+    # come somewhere else now
+    self.end_tick = None
+    end = self.tick
+    for redo in range(tick, end):
+      if redo > tick:
+        self.snapshots[redo] = (self.engines[0].snapshot(), self.engines[1].snapshot())
+      self.step(redo)
+      # A board tops out sooner with the inputs now known
+      if self.end_tick is not None:
+        self.tick = self.end_tick
+        break
+    self.rollback = end - tick
+    self.max_rollback_seen = max(self.max_rollback_seen, self.rollback)
+
+  def receive(self):
+    """
+    Read every packet waiting on the socket. Return the first simulated
+    update whose remote input turned out not to be what it was simulated
+    with, or None.
+    """
+    remote = 1 - self.player
+    first_wrong = None
+    while True:
+      try:
+        data, address = self.sock.recvfrom(2048)
+      except (BlockingIOError, InterruptedError):
+        break
+      except OSError:
+        # Such as the other side not listening yet
+        break
+      if not data:
+        continue
+      if data[0] == HELLO and len(data) == _hello.size:
+        kind, player, seed = _hello.unpack(data)
+        if player != remote:
+          continue
+        if not self.started:
+          if player == 0:
+            self.seed = seed
+          self.engines[0].start(self.seed)
+          self.engines[1].start(self.seed)
+          self.started = True
+        # Answer, in case our hello was lost
+        self.send_hello()
+      elif data[0] == INPUTS and len(data) >= _inputs.size:
+        kind, player, acked, start, count = _inputs.unpack_from(data)
+        if player != remote or len(data) != _inputs.size + count:
+          continue
+        self.acked = max(self.acked, acked)
+        inputs = self.inputs[remote]
+        for i in range(count):
+          tick = start + i
+          if tick < self.confirmed:
+            continue
+          mask = data[_inputs.size + i]
+          # Updates already simulated were predicted to have no input
+          if tick < self.tick and mask != inputs.get(tick, 0) and \
+            (first_wrong is None or tick < first_wrong):
+            first_wrong = tick
+          inputs[tick] = mask
+        while self.confirmed in inputs:
+          self.confirmed += 1
+    return first_wrong
+
+  def send_hello(self):
+    """
+    Send a hello with this side's seed.
+    """
+    self.last_hello = time.time()
+    self.send(_hello.pack(HELLO, self.player, self.seed))
+
+  def send_inputs(self):
+    """
+    Send the local inputs the other side hasn't acknowledged. Inputs are
+    final up to input_delay updates ahead, since later presses go later.
+    """
+    inputs = self.inputs[self.player]
+    end = min(self.tick + self.input_delay, self.acked + _max_inputs)
+    masks = bytes(inputs.get(tick, 0) for tick in range(self.acked, end))
+    self.send(_inputs.pack(INPUTS, self.player, self.confirmed, self.acked, len(masks)) + masks)
+
+  def send(self, data):
+    """
+    Send a packet to the other side. Lost packets are made up for by the
+    next ones, so errors are ignored.
+    """
+    try:
+      self.sock.sendto(data, self.remote)
+    except OSError:
+      pass
+
+  def finished(self):
+    """
+    Return whether the game is decided: a board has topped out with every
+    input up to then known, so no rollback can change it.
+    """
+    return self.started and self.end_tick is not None and self.confirmed >= self.end_tick
+
+  def winner(self):
+    """
+    Return number of the player who won, or None for a draw or if the game
+    isn't finished. Both engines are at end_tick, so both sides agree.
+    """
+    if not self.finished():
+      return None
+    over = [engine.game_over() for engine in self.engines]
+    if over[0] and over[1]:
+      return None
+    return 1 if over[0] else 0
+
+class LaggySocket:
+  """
+  Socket wrapper for testing that holds packets back for a random delay
+  and drops some of them.
+  """
+
+  def __init__(self, sock, delay=(0.01, 0.08), loss=0.1, seed=0):
+    """
+    Default constructor.
+    Arguments:
+      sock     socket from open_socket
+      delay    (min, max) seconds each sent packet is held back
+      loss     fraction of packets dropped
+      seed     seed for delays and losses
+    """
+    self.sock = sock
+    self.delay = delay
+    self.loss = loss
+    self.random = random.Random(seed)
+    # (send time, data, address) of packets held back
+    self.held = []
+
+  def sendto(self, data, address):
+    if self.random.random() >= self.loss:
+      self.held.append((time.time() + self.random.uniform(*self.delay), data, address))
+    return len(data)
+
+  def recvfrom(self, size):
+    now = time.time()
+    for packet in [packet for packet in self.held if packet[0] <= now]:
+      self.held.remove(packet)
+      self.sock.sendto(packet[1], packet[2])
+    return self.sock.recvfrom(size)
+
+def loopback_test(updates, lag=80, update_rate=60):
+  """
+  Play two sessions with random inputs against each other over loopback
+  with lag and loss, in real time, until the game is decided or has run
+  for updates updates. Print frame times by updates rolled back, and return
+  whether both sides ended in the same state with the same winner.
+  Arguments:
+    updates        number of updates to play
+    lag            most lag of a packet in milliseconds
+    update_rate    updates per second
+  """
+  socks = [open_socket(0, "127.0.0.1"), open_socket(0, "127.0.0.1")]
+  addresses = [sock.getsockname() for sock in socks]
+  sessions = [VersusSession((6, 15), 32, player,
+                            LaggySocket(socks[player], (lag / 4000.0, lag / 1000.0), seed=player),
+                            addresses[1 - player], seed=1234) for player in (0, 1)]
+  inputs = random.Random(0)
+  # Frame times by number of updates rolled back
+  frame_times = [[] for n in range(sessions[0].max_rollback + 1)]
+  start = time.time()
+  frame = 0
+  while not all(session.finished() or session.tick >= updates for session in sessions):
+    frame += 1
+    for session in sessions:
+      if inputs.random() < 0.2:
+        session.press(inputs.randrange(len(input_names)))
+      began = time.perf_counter()
+      due = int((time.time() - start) * update_rate) - session.tick
+      session.advance(min(max(due, 0), updates - session.tick))
+      frame_times[session.rollback].append(time.perf_counter() - began)
+    time.sleep(max(start + frame / update_rate - time.time(), 0))
+  # Let the last inputs arrive
+  for frame in range(60):
+    for session in sessions:
+      session.advance(0)
+    time.sleep(1.0 / update_rate)
+  snaps = [(session.engines[0].snapshot(), session.engines[1].snapshot()) for session in sessions]
+  same = all(snaps[0][i].grid == snaps[1][i].grid and snaps[0][i].score == snaps[1][i].score and
+             snaps[0][i].ticks == snaps[1][i].ticks for i in (0, 1)) and \
+    sessions[0].finished() == sessions[1].finished() and sessions[0].winner() == sessions[1].winner()
+  print("%d updates with up to %d ms lag" % (max(session.tick for session in sessions), lag))
+  for n, times in enumerate(frame_times):
+    if times:
+      times.sort()
+      print("rolled back %d: %5d frames, median %.3f ms, max %.3f ms" %
+            (n, len(times), times[len(times) // 2]*1e3, times[-1]*1e3))
+  if sessions[0].finished():
+    result = "player %d won" % sessions[0].winner() if sessions[0].winner() is not None else "draw"
+  else:
+    result = "not decided"
+  print("scores %s, %s, both sides %s" % ([engine.score for engine in sessions[0].engines], result,
+                                         "agree" if same else "DISAGREE"))
+  return same
+
+if __name__ == "__main__":
+  sys.exit(0 if loopback_test(*[int(arg) for arg in sys.argv[1:3]]) else 1)
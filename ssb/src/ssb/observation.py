@@ -0,0 +1,272 @@
+'''
+Shared memory observations for Something Something Bricks. Simulator
+processes write the state of their engine into a ring buffer in shared
+memory each step, and a learner process reads them as NumPy views, so
+observations are never pickled or sent through a pipe. Run this module to
+compare it with sending observations through a multiprocessing queue:
+
+  python observation.py [WORKERS] [STEPS]
+
+Created on Oct 18, 2026
+
+@author: Dan
+'''
+
+import multiprocessing
+import numpy
+import random
+import sys
+import time
+
+from multiprocessing import shared_memory
+
+from engine import BREAKER, COLOR_MASK, Engine
+
+## Shared memory layout: header, then capacity slots
+# Header words: magic, observations written so far, capacity, columns, rows
+_header_words = 8
+_magic = 0x5353424f
+_head = 1
+
+def observation_dtype(board_size):
+  """
+  Return NumPy dtype of one slot of the ring. Fields:
+    seq           sequence number of the slot, see ObservationRing
+    ticks         engine updates so far
+    score         score so far
+    state         index of the engine state in observation_states
+    colors        (cols, rows) color index of each cell, 0 for empty
+    breakers      (cols, rows) 1 where the cell holds a breaker
+    pair          code, column and y of each brick of the falling pair,
+                  all 0 if there is none
+    next_codes    codes of the next pair
+  Arguments:
+    board_size    number of (columns, rows)
+  """
+  return numpy.dtype([("seq", "<u8"), ("ticks", "<u4"), ("score", "<u4"), ("state", "u1"),
+                      ("colors", "u1", board_size), ("breakers", "u1", board_size),
+                      ("pair", "<i4", (6,)), ("next_codes", "u1", (2,))], align=True)
+
+# Engine states, by their number in observations
+observation_states = ("fall", "break", "new_brick", "game_over")
+
+class ObservationRing:
+  """
+  Ring buffer of engine observations in shared memory, with one writer and
+  any number of readers. Observation n goes to slot n % capacity, so readers
+  that fall more than capacity behind lose the oldest ones.
+
+  Each slot has a sequence number instead of a lock. The writer of
+  observation n sets it to 2n + 1 (odd while writing), writes the slot, then
+  sets it to 2n + 2 and bumps the head. A reader of observation n checks
+  the sequence number is 2n + 2 before and after reading; anything else
+  means it isn't written yet, or was overwritten while being read. Numbers
+  are 64-bit aligned words, written whole. Writes aren't reordered on x86;
+  other CPUs may need a stronger ordering than NumPy gives.
+  """
+
+  def __init__(self, board_size=None, capacity=1024, name=None):
+    """
+    Default constructor. Creates a new ring if board_size is given, or
+    attaches to the ring called name otherwise.
+    Arguments:
+      board_size    number of (columns, rows), to create a ring
+      capacity      number of slots, to create a ring
+      name          shared memory name of the ring to attach to, or of the
+                    ring to create (default is a unique name)
+    """
+    if board_size is not None:
+      dtype = observation_dtype(board_size)
+      self.shm = shared_memory.SharedMemory(name, create=True,
+                                            size=_header_words*8 + capacity*dtype.itemsize)
+      self.header = numpy.ndarray((_header_words,), "<u8", self.shm.buf)
+      self.header[:] = 0
+      self.header[2:5] = (capacity, board_size[0], board_size[1])
+      # Written last, so the ring is whole once it can be attached to
+      self.header[0] = _magic
+    else:
+      self.shm = shared_memory.SharedMemory(name)
+      self.header = numpy.ndarray((_header_words,), "<u8", self.shm.buf)
+      if self.header[0] != _magic:
+        raise Exception("Not an observation ring: %s" % name)
+      capacity = int(self.header[2])
+      board_size = (int(self.header[3]), int(self.header[4]))
+      dtype = observation_dtype(board_size)
+    self.name = self.shm.name
+    self.board_size = board_size
+    self.capacity = capacity
+    self.slots = numpy.ndarray((capacity,), dtype, self.shm.buf, _header_words*8)
+    # Views of each field across all slots
+    self.seqs = self.slots["seq"]
+    self.colors = self.slots["colors"]
+    self.breakers = self.slots["breakers"]
+
+  def head(self):
+    """
+    Return number of observations written so far.
+    """
+    return int(self.header[_head])
+
+  def write(self, engine):
+    """
+    Write the current state of an engine as the next observation. Only one
+    process may write to a ring.
+    Arguments:
+      engine    Engine of the board size of the ring
+    """
+    n = int(self.header[_head])
+    i = n % self.capacity
+    slot = self.slots[i]
+    self.seqs[i] = 2*n + 1
+    slot["ticks"] = engine.ticks
+    slot["score"] = engine.score
+    slot["state"] = observation_states.index(engine.state)
+    # Straight from the grid into shared memory, no temporary arrays
+    numpy.bitwise_and(engine.grid, COLOR_MASK, out=self.colors[i])
+    numpy.bitwise_and(engine.grid, BREAKER, out=self.breakers[i])
+    numpy.right_shift(self.breakers[i], 3, out=self.breakers[i])
+    p = engine.pair
+    slot["pair"] = (p.code1, p.col1, p.y1, p.code2, p.col2, p.y2) if p else (0,)*6
+    slot["next_codes"] = engine.next_codes
+    self.seqs[i] = 2*n + 2
+    self.header[_head] = n + 1
+
+  def view(self, n):
+    """
+    Return slot holding observation n as a NumPy record view into shared
+    memory, or None if it isn't written yet or was overwritten. Nothing is
+    copied, so check it with valid once done reading.
+    Arguments:
+      n    observation number, counting from 0
+    """
+    i = n % self.capacity
+    if self.seqs[i] != 2*n + 2:
+      return None
+    return self.slots[i]
+
+  def valid(self, n):
+    """
+    Return whether observation n is still in its slot, so what was read from
+    its view is whole.
+    Arguments:
+      n    observation number, counting from 0
+    """
+    return self.seqs[n % self.capacity] == 2*n + 2
+
+  def read(self, n):
+    """
+    Return copy of observation n, or None if it isn't written yet or was
+    overwritten.
+    Arguments:
+      n    observation number, counting from 0
+    """
+    slot = self.view(n)
+    if slot is None:
+      return None
+    slot = slot.copy()
+    return slot if self.valid(n) else None
+
+  def close(self):
+    """
+    Detach from the shared memory. The ring stays until it is unlinked.
+    """
+    # Views of the buffer must go before it can be closed
+    self.header = self.slots = self.seqs = self.colors = self.breakers = None
+    self.shm.close()
+
+  def unlink(self):
+    """
+    Free the shared memory once every process has closed it. Call once,
+    from the process that created the ring.
+    """
+    self.shm.unlink()
+
+def simulate(name, seed, steps, queue=None):
+  """
+  Simulator process for the benchmark: play a game with random inputs and
+  send an observation each update, to a ring or through a queue.
+  Arguments:
+    name     shared memory name of the ring to write to
+    seed     seed of the game and its inputs
+    steps    number of updates to play
+    queue    multiprocessing queue to send observations through instead
+  """
+  ring = ObservationRing(name=name) if queue is None else None
+  engine = Engine((6, 15), 32)
+  engine.start(seed)
+  inputs = random.Random(seed)
+  moves = (engine.move_left, engine.move_right, engine.rotate_cw, engine.rotate_ccw)
+  for step in range(steps):
+    if engine.game_over():
+      engine.start(inputs.getrandbits(32))
+    if inputs.random() < 0.1:
+      inputs.choice(moves)()
+    engine.update()
+    if ring:
+      ring.write(engine)
+    else:
+      p = engine.pair
+      queue.put((engine.ticks, engine.score, engine.state, engine.grid & COLOR_MASK,
+                 (engine.grid & BREAKER) >> 3, (p.code1, p.col1, p.y1, p.code2, p.col2, p.y2) if p else None,
+                 engine.next_codes))
+  if ring:
+    ring.close()
+  else:
+    queue.put(None)
+
+def benchmark(workers, steps):
+  """
+  Print observations per second read by a learner from simulator processes,
+  through shared memory rings and through a queue.
+  Arguments:
+    workers    number of simulator processes
+    steps      updates each simulator plays
+  """
+  # One ring per simulator, so each has one writer. Big enough that the
+  # learner never falls a lap behind in the benchmark.
+  rings = [ObservationRing((6, 15), steps) for i in range(workers)]
+  procs = [multiprocessing.Process(target=simulate, args=(ring.name, i, steps)) for i, ring in enumerate(rings)]
+  start = time.time()
+  for proc in procs:
+    proc.start()
+  read = [0] * workers
+  total = 0
+  while total < workers*steps:
+    for w, ring in enumerate(rings):
+      n = read[w]
+      slot = ring.view(n)
+      if slot is None:
+        continue
+      # A learner would use the view here, straight from shared memory
+      slot["colors"].sum()
+      if ring.valid(n):
+        total += 1
+      read[w] += 1
+  elapsed = time.time() - start
+  for proc in procs:
+    proc.join()
+  for ring in rings:
+    ring.close()
+    ring.unlink()
+  print("shared memory: %d observations in %.2f s, %d/s" % (total, elapsed, total / elapsed))
+
+  queue = multiprocessing.Queue()
+  procs = [multiprocessing.Process(target=simulate, args=(None, i, steps, queue)) for i in range(workers)]
+  start = time.time()
+  for proc in procs:
+    proc.start()
+  total = done = 0
+  while done < workers:
+    observation = queue.get()
+    if observation is None:
+      done += 1
+      continue
+    observation[3].sum()
+    total += 1
+  elapsed = time.time() - start
+  for proc in procs:
+    proc.join()
+  print("queue:         %d observations in %.2f s, %d/s" % (total, elapsed, total / elapsed))
+
+if __name__ == "__main__":
+  benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 2, int(sys.argv[2]) if len(sys.argv) > 2 else 50000)
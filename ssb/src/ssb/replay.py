@@ -0,0 +1,298 @@
+'''
+Replays for Something Something Bricks. A game is fully determined by its
+seed and the inputs given at each engine update, so a replay stores just
+those and is played back through the engine, headless at full speed or in
+real time by ssb.py. Keyframes of the engine state are stored every so often
+so playback can seek without simulating from the start.
+
+Usage:
+  python replay.py FILE...    play replays headless and check their scores
+
+Created on Oct 18, 2026
+
+@author: Dan
+'''
+
+import bisect
+import numpy
+import struct
+import sys
+import time
+
+from engine import Engine, Snapshot, col_tops
+
+## Inputs, by the Engine and Board method each one calls
+MOVE_LEFT = 0
+MOVE_RIGHT = 1
+ROTATE_CW = 2
+ROTATE_CCW = 3
+SPEED_UP = 4
+SLOW_DOWN = 5
+input_names = ("move_left", "move_right", "rotate_cw", "rotate_ccw", "speed_up", "slow_down")
+
+## File layout: header, then one varint per input of (tick delta << 3 | input),
+## then the keyframe index, then the keyframes
+# Magic string, version, columns, rows, row height, seed, end tick, score,
+# number of inputs, ticks between keyframes, number of keyframes
+_header = struct.Struct("<4sHHHHQIQIII")
+_magic = b"SSBR"
+_version = 2
+# Bits of each varint holding the input
+_input_bits = 3
+# Keyframe index entry: tick and number of inputs before it
+_index_entry = struct.Struct("<II")
+# Keyframe, followed by the RNG state and the grid: score, slow and current
+# fallspeeds, state, whether there is a falling pair, the pair's code, column
+# and y of each brick, and the next pair's codes
+_keyframe = struct.Struct("<QHHBBBBiBBiBB")
+# Python's Mersenne Twister state is 624 words and a position
+_rng_state = struct.Struct("<625I")
+# Engine states, by their keyframe number
+_states = ("fall", "break", "new_brick", "game_over")
+# Default ticks between keyframes (20 seconds at 60 updates per second)
+_keyframe_interval = 1200
+
+class Replay:
+  """
+  Seed and timestamped inputs of one game. Each input is stored with the
+  number of engine updates before it, and is applied before the next one.
+  """
+
+  def __init__(self, board_size, row_height, seed, keyframe_interval=_keyframe_interval):
+    """
+    Default constructor.
+    Arguments:
+      board_size           number of (columns, rows)
+      row_height           engine y units per row
+      seed                 seed the game was started with
+      keyframe_interval    engine updates between keyframes
+    """
+    self.board_size = board_size
+    self.row_height = row_height
+    self.seed = seed
+    self.keyframe_interval = keyframe_interval
+    # (tick, input) pairs in order
+    self.inputs = []
+    # (tick, number of inputs before it, packed engine state) in order
+    self.keyframes = []
+    # Engine ticks and score when recording ended
+    self.end_tick = 0
+    self.score = 0
+
+  def record(self, tick, action):
+    """
+    Add an input.
+    Arguments:
+      tick      number of engine updates before the input
+      action    input, such as MOVE_LEFT
+    """
+    self.inputs.append((tick, action))
+
+  def add_keyframe(self, engine):
+    """
+    Add a keyframe of the engine's current state.
+    Arguments:
+      engine    engine the game is played on
+    """
+    self.keyframes.append((engine.ticks, len(self.inputs), pack_keyframe(engine)))
+
+  def after_update(self, engine):
+    """
+    Add a keyframe if one is due. Call after each engine update.
+    Arguments:
+      engine    engine the game is played on
+    """
+    if engine.ticks % self.keyframe_interval == 0:
+      self.add_keyframe(engine)
+
+  def finish(self, engine):
+    """
+    Note the tick and score that recording ended at.
+    Arguments:
+      engine    engine the game was played on
+    """
+    self.end_tick = engine.ticks
+    self.score = engine.score
+
+  def save(self, filename):
+    """
+    Write replay to a file.
+    Arguments:
+      filename    name of replay file
+    """
+    data = bytearray(_header.pack(_magic, _version, self.board_size[0], self.board_size[1],
+                                  self.row_height, self.seed, self.end_tick, self.score,
+                                  len(self.inputs), self.keyframe_interval, len(self.keyframes)))
+    last_tick = 0
+    for tick, action in self.inputs:
+      value = (tick - last_tick) << _input_bits | action
+      last_tick = tick
+      # Little endian base 128, high bit set on all but the last byte
+      while value >= 0x80:
+        data.append(value & 0x7f | 0x80)
+        value >>= 7
+      data.append(value)
+    for tick, index, keyframe in self.keyframes:
+      data += _index_entry.pack(tick, index)
+    for tick, index, keyframe in self.keyframes:
+      data += keyframe
+    f = open(filename, "wb")
+    f.write(data)
+    f.close()
+
+def load_replay(filename):
+  """
+  Return Replay read from a file.
+  Arguments:
+    filename    name of replay file
+  """
+  f = open(filename, "rb")
+  data = bytearray(f.read())
+  f.close()
+  magic, version, cols, rows, row_height, seed, end_tick, score, count, interval, num_keyframes = \
+    _header.unpack_from(bytes(data[:_header.size]))
+  if magic != _magic or version != _version:
+    raise Exception("Not a replay file: %s" % filename)
+  replay = Replay((cols, rows), row_height, seed, interval)
+  replay.end_tick = end_tick
+  replay.score = score
+  pos = _header.size
+  tick = 0
+  for i in range(count):
+    value = shift = 0
+    while True:
+      byte = data[pos]
+      pos += 1
+      value |= (byte & 0x7f) << shift
+      shift += 7
+      if byte < 0x80:
+        break
+    tick += value >> _input_bits
+    replay.inputs.append((tick, value & ((1 << _input_bits) - 1)))
+  # Keyframes are all the same size, so they follow the index in order
+  size = _keyframe.size + _rng_state.size + cols*rows
+  start = pos + num_keyframes*_index_entry.size
+  for i in range(num_keyframes):
+    tick, index = _index_entry.unpack_from(bytes(data[pos:pos + _index_entry.size]))
+    pos += _index_entry.size
+    replay.keyframes.append((tick, index, bytes(data[start + i*size:start + (i + 1)*size])))
+  return replay
+
+def pack_keyframe(engine):
+  """
+  Return bytes holding the state of an engine between updates.
+  Arguments:
+    engine    Engine to pack
+  """
+  p = engine.pair
+  pair = (1, p.code1, p.col1, p.y1, p.code2, p.col2, p.y2) if p else (0,)*7
+  version, rng_state, gauss_next = engine.random.getstate()
+  return _keyframe.pack(engine.score, engine.fallspeed_slow, engine.fallspeed,
+                        _states.index(engine.state), *(pair + engine.next_codes)) + \
+    _rng_state.pack(*rng_state) + engine.grid.tobytes()
+
+def restore_keyframe(engine, keyframe, tick):
+  """
+  Put an engine in the state held by a keyframe.
+  Arguments:
+    engine      Engine to restore, of the replay's board size
+    keyframe    bytes from pack_keyframe
+    tick        tick the keyframe was taken at
+  """
+  score, slow, fallspeed, state, has_pair, code1, col1, y1, code2, col2, y2, next1, next2 = \
+    _keyframe.unpack_from(keyframe)
+  grid = keyframe[_keyframe.size + _rng_state.size:]
+  tops = col_tops(numpy.frombuffer(grid, engine.grid.dtype).reshape(engine.board_size))
+  # A settled grid has no breaks left, so checking every cell finds the
+  # same breaks as the cells changed since the last check
+  engine.restore(Snapshot(grid, tuple(tops.tolist()), frozenset(range(engine.grid.size)),
+                          (code1, col1, y1, code2, col2, y2) if has_pair else None,
+                          (next1, next2), score, slow, fallspeed, _states[state], tick, engine.seed,
+                          (3, _rng_state.unpack_from(keyframe, _keyframe.size), None), ()))
+
+class ReplayPlayer:
+  """
+  Feeds the inputs of a replay to an Engine or Board as its engine reaches
+  their ticks.
+  """
+
+  def __init__(self, replay):
+    """
+    Default constructor.
+    Arguments:
+      replay    Replay to play
+    """
+    self.replay = replay
+    # Index of the next input to apply
+    self.next = 0
+
+  def apply(self, target, tick):
+    """
+    Call target's method for each input due at tick.
+    Arguments:
+      target    Engine or Board to apply inputs to
+      tick      number of engine updates so far
+    """
+    inputs = self.replay.inputs
+    while self.next < len(inputs) and inputs[self.next][0] <= tick:
+      getattr(target, input_names[inputs[self.next][1]])()
+      self.next += 1
+
+  def done(self, engine):
+    """
+    Return whether the replay has reached the end of its recording.
+    Arguments:
+      engine    engine the replay is played on
+    """
+    return engine.game_over() or engine.ticks >= self.replay.end_tick
+
+def seek_replay(replay, engine, tick):
+  """
+  Put an engine in its state at a tick of a replay, by restoring the last
+  keyframe at or before it and simulating the ticks after. Return a
+  ReplayPlayer that continues the replay from there.
+  Arguments:
+    replay    Replay to seek in
+    engine    Engine to play the replay on
+    tick      number of engine updates to seek to
+  """
+  player = ReplayPlayer(replay)
+  # Last keyframe at or before tick, or the start of the game if there is none
+  i = bisect.bisect_right(replay.keyframes, (tick, float("inf")))
+  if i:
+    keyframe_tick, player.next, keyframe = replay.keyframes[i - 1]
+    restore_keyframe(engine, keyframe, keyframe_tick)
+    engine.seed = replay.seed
+  else:
+    engine.start(replay.seed)
+  while engine.ticks < tick and not player.done(engine):
+    player.apply(engine, engine.ticks)
+    engine.update()
+  return player
+
+def play_replay(replay):
+  """
+  Play a replay headless as fast as possible. Return the engine at the end.
+  Arguments:
+    replay    Replay to play
+  """
+  engine = Engine(replay.board_size, replay.row_height)
+  engine.start(replay.seed)
+  player = ReplayPlayer(replay)
+  while not player.done(engine):
+    player.apply(engine, engine.ticks)
+    engine.update()
+  return engine
+
+if __name__ == "__main__":
+  failed = 0
+  for filename in sys.argv[1:]:
+    replay = load_replay(filename)
+    start = time.time()
+    engine = play_replay(replay)
+    elapsed = time.time() - start
+    ok = engine.score == replay.score and engine.ticks == replay.end_tick
+    failed += not ok
+    print("%s: score %d (recorded %d), %d ticks in %.3f s, %s" %
+          (filename, engine.score, replay.score, engine.ticks, elapsed, "ok" if ok else "MISMATCH"))
+  sys.exit(1 if failed else 0)
@@ -0,0 +1,227 @@
+'''
+Headless self-play for Something Something Bricks. Plays many games across a
+pool of worker processes, driven by the bot or by random inputs, and prints
+statistics of the results as they come in. Used to tune the rules, such as
+the breaker probability and how fast the fallspeed goes up with score.
+
+Usage:
+  python selfplay.py [-n GAMES] [-j WORKERS] [--policy bot|random] [--seed SEED]
+                     [--breaker-prob P] [--points-per-speed POINTS] [-o FILE]
+
+Run with --help for all options.
+
+Created on Oct 18, 2026
+
+@author: Dan
+'''
+
+import argparse
+import collections
+import multiprocessing
+import random
+import statistics
+import sys
+import time
+
+from bot import Bot
+from engine import CCW, CW, LEFT, RIGHT, Engine
+
+# Result of one game. cause is why it ended: "topped_out" when the spawn
+# column filled, "no_safe_placement" when the bot found every placement of
+# a pair ends the game, or "tick_limit".
+GameResult = collections.namedtuple("GameResult", "seed score pieces max_chain ticks cause")
+
+# Engine method called for each bot move
+_move_methods = {LEFT: "move_left", RIGHT: "move_right", CW: "rotate_cw", CCW: "rotate_ccw"}
+# Inputs the random policy picks from
+_random_inputs = ("move_left", "move_right", "rotate_cw", "rotate_ccw", "speed_up", "slow_down")
+
+## State of each worker process, set up once by init_worker
+# Settings shared by every game
+_settings = None
+# Bot reused for every game the worker plays, so its tables stay warm
+_bot = None
+
+def init_worker(settings):
+  """
+  Set up a worker process. Called once in each process of the pool.
+  Arguments:
+    settings    argparse Namespace of the command line options
+  """
+  global _settings, _bot
+  _settings = settings
+  if settings.policy == "bot":
+    _bot = Bot(settings.board_size, settings.row_height, depth=settings.depth,
+               beam_width=settings.beam_width)
+
+def new_engine(settings):
+  """
+  Return Engine with the rule settings being tuned.
+  Arguments:
+    settings    argparse Namespace of the command line options
+  """
+  engine = Engine(settings.board_size, settings.row_height)
+  engine._breaker_prob = settings.breaker_prob
+  engine._points_per_speed = settings.points_per_speed
+  return engine
+
+def play_game(seed):
+  """
+  Play one game to the end in a worker process. Return its GameResult.
+  Arguments:
+    seed    seed for the game's bricks and for the random policy
+  """
+  settings = _settings
+  engine = new_engine(settings)
+  engine.start(seed)
+  # Random inputs are seeded from the game's seed too, so a game can be
+  # played again on its own
+  inputs = random.Random(seed)
+  pieces = max_chain = 0
+  pair = None
+  cause = "tick_limit"
+  while engine.ticks < settings.max_ticks:
+    if engine.game_over():
+      cause = "topped_out"
+      break
+    if settings.policy == "bot":
+      # Place each new pair as soon as it spawns, then drop it fast
+      if engine.pair and engine.pair is not pair:
+        pair = engine.pair
+        plan = _bot.plan(engine)
+        if plan is None:
+          cause = "no_safe_placement"
+          break
+        for move in plan.moves:
+          getattr(engine, _move_methods[move])()
+        engine.speed_up()
+    elif inputs.random() < settings.input_rate:
+      getattr(engine, inputs.choice(_random_inputs))()
+    resolving = engine.state == "break"
+    engine.update()
+    if resolving:
+      max_chain = max(max_chain, len(engine.chain))
+    pieces += engine.events.count("lock")
+  return GameResult(seed, engine.score, pieces, max_chain, engine.ticks, cause)
+
+class Summary:
+  """
+  Statistics of game results, added one at a time as they come in.
+  """
+
+  def __init__(self):
+    """
+    Default constructor.
+    """
+    self.results = []
+    # Number of games by max chain depth and by game over cause
+    self.chains = collections.Counter()
+    self.causes = collections.Counter()
+
+  def add(self, result):
+    """
+    Add the result of a game.
+    Arguments:
+      result    GameResult
+    """
+    self.results.append(result)
+    self.chains[result.max_chain] += 1
+    self.causes[result.cause] += 1
+
+  def describe(self, field):
+    """
+    Return line of mean, standard deviation, min, median and max of a
+    GameResult field over the games.
+    Arguments:
+      field    name of field, such as "score"
+    """
+    values = [getattr(result, field) for result in self.results]
+    stdev = statistics.stdev(values) if len(values) > 1 else 0.0
+    return "%-10s mean %10.1f  stdev %10.1f  min %8d  median %10.1f  max %8d" % \
+      (field, statistics.mean(values), stdev, min(values), statistics.median(values), max(values))
+
+  def report(self, elapsed):
+    """
+    Return summary of the games as text.
+    Arguments:
+      elapsed    seconds the games took
+    """
+    games = len(self.results)
+    ticks = sum(result.ticks for result in self.results)
+    lines = ["%d games in %.1f s: %.2f games/s, %d ticks/s" %
+             (games, elapsed, games / elapsed, ticks / elapsed)]
+    for field in ("score", "pieces", "max_chain", "ticks"):
+      lines.append(self.describe(field))
+    lines.append("max chain  " + "  ".join("%d: %d" % (depth, count)
+                                           for depth, count in sorted(self.chains.items())))
+    lines.append("ended by   " + "  ".join("%s: %d" % (cause, count)
+                                           for cause, count in self.causes.most_common()))
+    return "\n".join(lines)
+
+def parse_args(argv):
+  """
+  Return argparse Namespace of command line options.
+  Arguments:
+    argv    command line arguments, without the program name
+  """
+  parser = argparse.ArgumentParser(description="Play headless games and summarize the results.")
+  parser.add_argument("-n", "--games", type=int, default=100, help="number of games to play")
+  parser.add_argument("-j", "--workers", type=int, default=multiprocessing.cpu_count(),
+                      help="number of worker processes (default: one per core)")
+  parser.add_argument("--policy", choices=("bot", "random"), default="bot",
+                      help="what plays the games")
+  parser.add_argument("--seed", type=int, default=0,
+                      help="seed of the first game; game i is seeded seed + i")
+  parser.add_argument("--depth", type=int, default=2, help="bot search depth")
+  parser.add_argument("--beam-width", type=int, default=4, help="bot beam width")
+  parser.add_argument("--input-rate", type=float, default=0.1,
+                      help="chance per update of a random input, for the random policy")
+  parser.add_argument("--breaker-prob", type=float, default=Engine._breaker_prob,
+                      help="probability of a breaker brick")
+  parser.add_argument("--points-per-speed", type=int, default=Engine._points_per_speed,
+                      help="points scored per step up in fallspeed")
+  parser.add_argument("--max-ticks", type=int, default=100000,
+                      help="updates before a game is stopped")
+  parser.add_argument("-o", "--output", help="CSV file to write each game's result to")
+  settings = parser.parse_args(argv)
+  # Same board as ssb.py, with y measured in pixels
+  settings.board_size = (6, 15)
+  settings.row_height = 32
+  return settings
+
+def main(argv):
+  """
+  Play the games and print their summary. Return exit status.
+  Arguments:
+    argv    command line arguments, without the program name
+  """
+  settings = parse_args(argv)
+  summary = Summary()
+  output = open(settings.output, "w") if settings.output else None
+  if output:
+    output.write(",".join(GameResult._fields) + "\n")
+  seeds = range(settings.seed, settings.seed + settings.games)
+  start = time.time()
+  pool = multiprocessing.Pool(settings.workers, init_worker, (settings,))
+  try:
+    # Games come back as they finish, in any order, one at a time so
+    # workers stay busy until the last game
+    for result in pool.imap_unordered(play_game, seeds, chunksize=1):
+      summary.add(result)
+      if output:
+        output.write(",".join(str(value) for value in result) + "\n")
+      sys.stderr.write("\r%d/%d games" % (len(summary.results), settings.games))
+    pool.close()
+    pool.join()
+  finally:
+    pool.terminate()
+    if output:
+      output.close()
+  sys.stderr.write("\n")
+  print(summary.report(time.time() - start))
+  return 0
+
+if __name__ == "__main__":
+  # Needed for worker processes of a frozen Windows build
+  multiprocessing.freeze_support()
+  sys.exit(main(sys.argv[1:]))
@@ -10,6 +10,8 @@ from distutils.core import setup
 import py2exe
 import os
 
+import bundle
+
 origIsSystemDLL = py2exe.build_exe.isSystemDLL
 def isSystemDLL(pathname):
         if os.path.basename(pathname).lower() in ("libfreetype-6.dll", "libogg-0.dll", "sdl_ttf.dll"):
@@ -17,4 +19,6 @@ def isSystemDLL(pathname):
         return origIsSystemDLL(pathname)
 py2exe.build_exe.isSystemDLL = isSystemDLL
 
-setup(console=["ssb.py"])
\ No newline at end of file
+# Pack images, sounds and fonts into one file shipped next to the exe
+bundle.build()
+setup(console=["ssb.py"], data_files=[("", [bundle.bundle_path])])
\ No newline at end of file
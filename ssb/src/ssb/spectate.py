@@ -0,0 +1,460 @@
+'''
+Spectator server for Something Something Bricks. The game publishes its
+engine after each update, and the server streams what changed to any
+number of TCP viewers: a full keyframe of the board every so often, and
+small deltas in between. The server runs an asyncio loop on its own thread,
+so a slow viewer never holds up the game. Run this module to serve a few
+headless games and check viewers see them exactly:
+
+  python spectate.py [VIEWERS] [UPDATES]
+
+Created on Oct 18, 2026
+
+@author: Dan
+'''
+
+import asyncio
+import numpy
+import random
+import struct
+import sys
+import threading
+import time
+
+from engine import Engine, cell_dtype
+
+## Stream layout: hello, then frames of (body size, type, body)
+# Magic string, version, columns, rows
+_hello = struct.Struct("<4sBBB")
+_magic = b"SSBS"
+_version = 1
+_frame = struct.Struct("<IB")
+KEYFRAME = 0
+DELTA = 1
+# Keyframe: tick, score, state, whether there is a falling pair, the pair's
+# code, column and y of each brick, the next pair's codes. Followed by the
+# grid, one byte per cell.
+_keyframe = struct.Struct("<IIBB6hBB")
+# Delta: tick and flags of what changed, then each part flagged in order
+_delta = struct.Struct("<IB")
+SCORE = 0x01
+STATE = 0x02
+PAIR = 0x04
+NEXT = 0x08
+EVENTS = 0x10
+CELLS = 0x20
+_score = struct.Struct("<I")
+_state = struct.Struct("<B")
+# Whether there is a falling pair, then its code, column and y of each brick
+_pair = struct.Struct("<B6h")
+_next = struct.Struct("<BB")
+# Number of bricks locked and of breakers gone off during the update
+_events = struct.Struct("<BB")
+# Number of changed cells, then each one's flat index (col*rows + row) and code
+_cells = struct.Struct("<H")
+_cell = struct.Struct("<HB")
+# Engine states, by their number in the stream
+stream_states = ("fall", "break", "new_brick", "game_over")
+
+def pair_fields(engine):
+  """
+  Return (has pair, code1, col1, y1, code2, col2, y2) of an engine's
+  falling pair.
+  """
+  p = engine.pair
+  return (1, p.code1, p.col1, p.y1, p.code2, p.col2, p.y2) if p else (0,)*7
+
+class StreamEncoder:
+  """
+  Turns the engine's state after each update into stream frames, keeping
+  what was last sent to find what changed.
+  """
+
+  def __init__(self, board_size, keyframe_interval=300):
+    """
+    Default constructor.
+    Arguments:
+      board_size           number of (columns, rows)
+      keyframe_interval    updates between keyframes
+    """
+    self.board_size = board_size
+    self.keyframe_interval = keyframe_interval
+    # State last sent
+    self.grid = numpy.zeros(board_size, dtype=cell_dtype)
+    self.tick = None
+    self.score = None
+    self.state = None
+    self.pair = None
+    self.next_codes = None
+
+  def hello(self):
+    """
+    Return bytes viewers are sent first.
+    """
+    return _hello.pack(_magic, _version, self.board_size[0], self.board_size[1])
+
+  def encode(self, engine):
+    """
+    Return (frame, whether it is a keyframe) for an engine's current state,
+    or None if it hasn't updated since the last call. A new game, or one
+    that went back in time, starts with a keyframe.
+    Arguments:
+      engine    Engine being watched, between updates
+    """
+    tick = engine.ticks
+    if tick == self.tick:
+      return None
+    if self.tick is None or tick < self.tick or tick % self.keyframe_interval == 0:
+      return self.keyframe(engine), True
+    parts = []
+    flags = 0
+    if engine.score != self.score:
+      flags |= SCORE
+      parts.append(_score.pack(engine.score))
+    state = stream_states.index(engine.state)
+    if state != self.state:
+      flags |= STATE
+      parts.append(_state.pack(state))
+    pair = pair_fields(engine)
+    if pair != self.pair:
+      flags |= PAIR
+      parts.append(_pair.pack(*pair))
+    if engine.next_codes != self.next_codes:
+      flags |= NEXT
+      parts.append(_next.pack(*engine.next_codes))
+    if engine.events:
+      flags |= EVENTS
+      parts.append(_events.pack(engine.events.count("lock"), engine.events.count("break")))
+    changed = (engine.grid != self.grid).ravel().nonzero()[0]
+    if changed.size:
+      flags |= CELLS
+      codes = engine.grid.ravel()[changed]
+      parts.append(_cells.pack(changed.size))
+      parts.append(b"".join(_cell.pack(index, code) for index, code in zip(changed.tolist(), codes.tolist())))
+      self.grid[:] = engine.grid
+    self.tick, self.score, self.state, self.pair, self.next_codes = \
+      tick, engine.score, state, pair, engine.next_codes
+    body = _delta.pack(tick, flags) + b"".join(parts)
+    return _frame.pack(len(body), DELTA) + body, False
+
+  def keyframe(self, engine):
+    """
+    Return keyframe frame of an engine's current state.
+    Arguments:
+      engine    Engine being watched, between updates
+    """
+    self.tick, self.score = engine.ticks, engine.score
+    self.state = stream_states.index(engine.state)
+    self.pair = pair_fields(engine)
+    self.next_codes = engine.next_codes
+    self.grid[:] = engine.grid
+    body = _keyframe.pack(self.tick, self.score, self.state, *(self.pair + self.next_codes)) + \
+      engine.grid.tobytes()
+    return _frame.pack(len(body), KEYFRAME) + body
+
+class StreamDecoder:
+  """
+  Board state of a stream, rebuilt from its frames as bytes come in. Bytes
+  can be fed in any chunks.
+  """
+
+  def __init__(self):
+    """
+    Default constructor.
+    """
+    self.buffer = bytearray()
+    self.board_size = None
+    self.grid = None
+    self.tick = 0
+    self.score = 0
+    self.state = "fall"
+    # (code1, col1, y1, code2, col2, y2) of the falling pair, or None
+    self.pair = None
+    self.next_codes = (0, 0)
+    # Bricks locked and breakers gone off in frames fed so far
+    self.locks = 0
+    self.breaks = 0
+    # Whether a keyframe has come in, so the board is whole
+    self.synced = False
+
+  def feed(self, data):
+    """
+    Add bytes of the stream and apply every whole frame in them. Return
+    number of frames applied.
+    Arguments:
+      data    bytes from the server
+    """
+    self.buffer += data
+    buf = self.buffer
+    pos = 0
+    if self.board_size is None:
+      if len(buf) < _hello.size:
+        return 0
+      magic, version, cols, rows = _hello.unpack_from(buf)
+      if magic != _magic or version != _version:
+        raise Exception("Not a spectator stream")
+      self.board_size = (cols, rows)
+      self.grid = numpy.zeros(self.board_size, dtype=cell_dtype)
+      pos = _hello.size
+    frames = 0
+    while len(buf) - pos >= _frame.size:
+      size, kind = _frame.unpack_from(buf, pos)
+      if len(buf) - pos - _frame.size < size:
+        break
+      body = memoryview(buf)[pos + _frame.size:pos + _frame.size + size]
+      if kind == KEYFRAME:
+        self.apply_keyframe(body)
+      else:
+        self.apply_delta(body)
+      body.release()
+      pos += _frame.size + size
+      frames += 1
+    del buf[:pos]
+    return frames
+
+  def apply_keyframe(self, body):
+    """
+    Apply keyframe body.
+    """
+    fields = _keyframe.unpack_from(body)
+    self.tick, self.score = fields[0], fields[1]
+    self.state = stream_states[fields[2]]
+    self.pair = tuple(fields[4:10]) if fields[3] else None
+    self.next_codes = tuple(fields[10:12])
+    self.grid[:] = numpy.frombuffer(body, cell_dtype, offset=_keyframe.size).reshape(self.board_size)
+    self.synced = True
+
+  def apply_delta(self, body):
+    """
+    Apply delta body.
+    """
+    self.tick, flags = _delta.unpack_from(body)
+    pos = _delta.size
+    if flags & SCORE:
+      self.score, = _score.unpack_from(body, pos)
+      pos += _score.size
+    if flags & STATE:
+      self.state = stream_states[_state.unpack_from(body, pos)[0]]
+      pos += _state.size
+    if flags & PAIR:
+      fields = _pair.unpack_from(body, pos)
+      self.pair = tuple(fields[1:]) if fields[0] else None
+      pos += _pair.size
+    if flags & NEXT:
+      self.next_codes = _next.unpack_from(body, pos)
+      pos += _next.size
+    if flags & EVENTS:
+      locks, breaks = _events.unpack_from(body, pos)
+      self.locks += locks
+      self.breaks += breaks
+      pos += _events.size
+    if flags & CELLS:
+      count, = _cells.unpack_from(body, pos)
+      pos += _cells.size
+      cells = self.grid.ravel()
+      for index, code in _cell.iter_unpack(body[pos:pos + count*_cell.size]):
+        cells[index] = code
+
+class SpectatorServer:
+  """
+  Streams a game to TCP viewers from an asyncio loop on its own thread. The
+  game thread only encodes each update and hands the frame to the loop.
+  Frames are written without waiting; a viewer whose unsent data passes
+  max_buffer stops getting frames, and once it has caught up it is sent
+  the latest keyframe and the deltas since, so it never holds up the game
+  or anyone else.
+  """
+
+  def __init__(self, board_size, host="127.0.0.1", port=7878, keyframe_interval=300,
+               max_buffer=64*1024):
+    """
+    Default constructor. Call start to begin serving.
+    Arguments:
+      board_size           number of (columns, rows)
+      host                 local address to listen on
+      port                 local port to listen on, 0 for any free port
+      keyframe_interval    updates between keyframes
+      max_buffer           bytes of unsent data a viewer may fall behind
+    """
+    self.encoder = StreamEncoder(board_size, keyframe_interval)
+    self.host = host
+    self.port = port
+    self.max_buffer = max_buffer
+    self.loop = None
+    self.server = None
+    self.thread = None
+    # Latest keyframe and the deltas after it, for viewers joining or
+    # catching up. Only touched on the loop's thread.
+    self.keyframe = None
+    self.deltas = []
+    # Writer of each viewer, and the viewers waiting to catch up
+    self.viewers = set()
+    self.behind = set()
+
+  def start(self):
+    """
+    Start the server thread and wait until it is listening. Return the port
+    it listens on.
+    """
+    ready = threading.Event()
+    self.thread = threading.Thread(target=self.run, args=(ready,), name="spectate")
+    self.thread.daemon = True
+    self.thread.start()
+    ready.wait()
+    return self.port
+
+  def run(self, ready):
+    """
+    Server thread: run the asyncio loop until stopped.
+    """
+    self.loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(self.loop)
+    self.server = self.loop.run_until_complete(asyncio.start_server(self.serve, self.host, self.port))
+    self.port = self.server.sockets[0].getsockname()[1]
+    ready.set()
+    try:
+      self.loop.run_forever()
+    finally:
+      self.server.close()
+      for writer in list(self.viewers):
+        writer.close()
+      self.loop.run_until_complete(self.server.wait_closed())
+      self.loop.close()
+
+  def stop(self):
+    """
+    Close every viewer and stop the server thread.
+    """
+    if self.loop:
+      self.loop.call_soon_threadsafe(self.loop.stop)
+      self.thread.join()
+      self.loop = None
+
+  def publish(self, engine):
+    """
+    Send the viewers what changed since the last call. Call from the game
+    loop after each engine update. Doesn't wait on the network.
+    Arguments:
+      engine    Engine being watched
+    """
+    encoded = self.encoder.encode(engine)
+    if encoded and self.loop:
+      self.loop.call_soon_threadsafe(self.broadcast, *encoded)
+
+  def broadcast(self, frame, is_keyframe):
+    """
+    Write a frame to every viewer that is keeping up. Runs on the loop.
+    """
+    if is_keyframe:
+      self.keyframe = frame
+      self.deltas = []
+    else:
+      self.deltas.append(frame)
+    for writer in list(self.viewers):
+      buffered = writer.transport.get_write_buffer_size()
+      if writer in self.behind:
+        # Caught up enough to start over from the latest keyframe
+        if buffered <= self.max_buffer // 2:
+          self.behind.discard(writer)
+          self.catch_up(writer)
+      elif buffered > self.max_buffer:
+        self.behind.add(writer)
+      else:
+        writer.write(frame)
+
+  def catch_up(self, writer):
+    """
+    Write the latest keyframe and the deltas since to a viewer.
+    """
+    if self.keyframe:
+      writer.write(self.keyframe + b"".join(self.deltas))
+
+  async def serve(self, reader, writer):
+    """
+    Serve one viewer until it disconnects. Runs on the loop.
+    """
+    writer.write(self.encoder.hello())
+    self.catch_up(writer)
+    self.viewers.add(writer)
+    try:
+      # Viewers don't send anything; reading just notices when they leave
+      while await reader.read(1024):
+        pass
+    except ConnectionError:
+      pass
+    finally:
+      self.viewers.discard(writer)
+      self.behind.discard(writer)
+      writer.close()
+
+def check(num_viewers=100, updates=1200, update_rate=60):
+  """
+  Serve a headless game with random inputs to viewers on loopback, one of
+  which never reads, in real time. Print publish times, and return whether
+  every reading viewer ended with the game's exact board.
+  Arguments:
+    num_viewers    number of viewers that read
+    updates        number of updates to play
+    update_rate    updates per second
+  """
+  import socket
+  server = SpectatorServer((6, 15), port=0)
+  port = server.start()
+  # A viewer that never reads, whose buffers fill up
+  stuck = socket.create_connection(("127.0.0.1", port))
+  stuck.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4096)
+  viewers = []
+  for i in range(num_viewers):
+    sock = socket.create_connection(("127.0.0.1", port))
+    sock.setblocking(False)
+    viewers.append((sock, StreamDecoder()))
+
+  def read_all():
+    for sock, decoder in viewers:
+      while True:
+        try:
+          data = sock.recv(65536)
+        except BlockingIOError:
+          break
+        if not data:
+          break
+        decoder.feed(data)
+
+  engine = Engine((6, 15), 32)
+  engine.start(1)
+  inputs = random.Random(1)
+  moves = (engine.move_left, engine.move_right, engine.rotate_cw, engine.rotate_ccw, engine.speed_up)
+  times = []
+  start = time.time()
+  for tick in range(updates):
+    if engine.game_over():
+      engine.start(inputs.getrandbits(32))
+    if inputs.random() < 0.2:
+      inputs.choice(moves)()
+    engine.update()
+    began = time.perf_counter()
+    server.publish(engine)
+    times.append(time.perf_counter() - began)
+    # Viewers joining late
+    if tick == updates // 2:
+      sock = socket.create_connection(("127.0.0.1", port))
+      sock.setblocking(False)
+      viewers.append((sock, StreamDecoder()))
+    read_all()
+    time.sleep(max(start + (tick + 1.0) / update_rate - time.time(), 0))
+  deadline = time.time() + 5
+  while time.time() < deadline and not all(decoder.tick == engine.ticks for sock, decoder in viewers):
+    read_all()
+    time.sleep(0.01)
+  same = all(decoder.tick == engine.ticks and decoder.score == engine.score and
+             (decoder.grid == engine.grid).all() for sock, decoder in viewers)
+  server.stop()
+  stuck.close()
+  times.sort()
+  print("%d updates to %d viewers and one stuck viewer: publish median %.1f us, p99 %.1f us, max %.1f us" %
+        (updates, len(viewers), times[len(times) // 2]*1e6, times[int(len(times)*0.99)]*1e6, times[-1]*1e6))
+  print("viewers %s" % ("all match the game" if same else "DON'T MATCH"))
+  return same
+
+if __name__ == "__main__":
+  sys.exit(0 if check(*[int(arg) for arg in sys.argv[1:3]]) else 1)
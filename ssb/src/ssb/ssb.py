@@ -3,6 +3,14 @@ Something Something Bricks
 
 Super Puzzle Fighter clone using pygame.
 
+Usage:
+  python ssb.py           play
+  python ssb.py FILE      watch a replay saved by an earlier game, with left
+                          and right keys to seek
+  python ssb.py versus PLAYER PORT HOST:PORT
+                          play versus over UDP as player 0 or 1, listening
+                          on PORT, against the other player at HOST:PORT
+
 Created on Dec 20, 2011
 
 @author: Daniel Lo
@@ -11,9 +19,16 @@ Created on Dec 20, 2011
 import pygame
 import sys
 
+from assets import atlas
+from audio import sound_queue
 from board import Board
+from bundle import bundle
 from color import *
 from menu import Menu
+from netplay import VersusSession, open_socket
+from replay import MOVE_LEFT, MOVE_RIGHT, ROTATE_CCW, ROTATE_CW, SLOW_DOWN, SPEED_UP, ReplayPlayer, load_replay
+from spectate import SpectatorServer
+from timestep import FixedTimestep
 
 ## Size parameters  
 # number of rows and columns in play area
@@ -21,38 +36,80 @@ board_size = num_cols, num_rows = 6, 15
 # Block width, used to space out objects
 brick_size = bw, bh = (32, 32)
 
+## Timing parameters
+# Game updates per second. Fallspeeds and break time are based on this.
+update_rate = 60
+# Frames drawn per second (0 for no limit), independent of update_rate
+render_fps = 60
+# Only redraw and update the parts of the screen that changed
+dirty_rect_mode = True
+# Show a suggested placement of the falling pair (toggled with H)
+show_hint = False
+
+## Versus parameters
+# Player number, local port and other player's address, if a versus game
+# was given on the command line
+versus_args = sys.argv[2:5] if len(sys.argv) > 4 and sys.argv[1] == "versus" else None
+# Updates between a local input and when it is applied
+versus_input_delay = 2
+# Milliseconds the result is shown before returning to the menu
+versus_result_time = 3000
+
+## Spectator parameters
+# Local port to stream the game to spectators on, None for no streaming
+spectate_port = None
+
+## Replay parameters
+# File the last game played is saved to, when it ends or the game is quit
+replay_filename = "last_replay.ssbr"
+# Replay being watched, if one was given on the command line
+replay_player = ReplayPlayer(load_replay(sys.argv[1])) if len(sys.argv) > 1 and not versus_args else None
+# Seconds to seek back or forward while watching
+replay_seek_time = 10
+
 ## Pygame initialization
 # Reduce sound buffer size (4096 to 512) to reduce lag
 pygame.mixer.pre_init(44100, -16, 2, 512)
 # Initialize Pygame    
 pygame.init()
-# Window size
+# Window size, with room for two boards side by side in versus
 size = width, height = (num_cols + 2)*2*bw, (num_rows - 1)*bh
+if versus_args:
+  size = (2*width, height)
 # Initialize window
 screen = pygame.display.set_mode(size)
 pygame.display.set_caption('Something Something Bricks')
+# Load images now that they can be converted to the display format
+atlas.prewarm()
 
 # Clock for keeping track of fps
 fps_clock = pygame.time.Clock()
+# Clock for running game updates at update_rate
+update_clock = FixedTimestep(update_rate)
   
 # Screen shot counter
 screen_shot_count = 0
 
 # State of the game: playing or in menu
 game_state = "menu"
+# State of the game when the screen was last drawn
+drawn_state = None
 
 # Create game board object
-game_board = Board(board_size, brick_size, pygame.mixer)
+game_board = Board(board_size, brick_size, pygame.mixer, update_rate)
+if show_hint:
+  game_board.toggle_hint()
 
 # topleft corner of where to display menu
 menu_topleft = (game_board.max_pos_x + 4*game_board.bw, 2*game_board.bh)
 # Create menu object
 menu_obj = Menu(menu_topleft, pygame.mixer)
 
-# Directory where sounds are kept
+# Directory in the asset bundle where sounds are kept
 snd_dir = "sounds/"
-# Background music
-snd_background = pygame.mixer.Sound(snd_dir + "ssb_bg.ogg")
+# Background music, streamed as it plays instead of decoded into memory
+pygame.mixer.music.load(bundle.open(snd_dir + "ssb_bg.ogg"), "ogg")
+snd_background = pygame.mixer.music
 snd_bg_vol = 0.2 # Volume when on
 snd_background.play(loops=-1)
 # Default is not muted
@@ -62,6 +119,50 @@ if mute:
 else:
   snd_background.set_volume(snd_bg_vol)
 
+# Stream the game to anyone connecting to spectate_port
+spectator_server = None
+if spectate_port is not None:
+  spectator_server = SpectatorServer(board_size, "0.0.0.0", spectate_port)
+  spectator_server.start()
+
+# Watch replay right away if one was given
+if replay_player:
+  game_state = "play"
+  game_board.start(replay_player.replay.seed)
+
+# Versus game, played right away if one was given. Both boards are drawn
+# from the session's engines, each to its half of the window.
+versus_session = None
+# Result of the versus game once decided, and when it was
+versus_result = None
+versus_result_start = 0
+if versus_args:
+  game_state = "versus"
+  # No bot help in a competitive game
+  if game_board.show_hint:
+    game_board.toggle_hint()
+  player = int(versus_args[0])
+  remote_host, remote_port = versus_args[2].rsplit(":", 1)
+  versus_session = VersusSession(board_size, bh, player, open_socket(int(versus_args[1])),
+                                 (remote_host, int(remote_port)), input_delay=versus_input_delay)
+  versus_boards = [game_board, Board(board_size, brick_size, pygame.mixer, update_rate)]
+  if player == 1:
+    versus_boards.reverse()
+  versus_surfaces = []
+  for i, board in enumerate(versus_boards):
+    board.engine = versus_session.engines[i]
+    # Versus scores aren't single player high scores
+    board.keep_highscore = False
+    versus_surfaces.append(screen.subsurface(pygame.Rect((i*width, 0), (width, height))))
+
+def quit_game():
+  """
+  Save replay of a game being played and exit.
+  """
+  if game_state == "play" and not replay_player:
+    game_board.save_replay(replay_filename)
+  sys.exit()
+
 # Main loop
 while True:
     
@@ -72,7 +173,7 @@ while True:
       # Key down handling for all states
       # Quit game
       if event.key == pygame.K_ESCAPE:
-        sys.exit()
+        quit_game()
       # Save a screen cap when I is pressed
       elif event.key == pygame.K_i:
         pygame.image.save(screen, "screenshot_%d.png" % screen_shot_count)
@@ -87,12 +188,22 @@ while True:
         else:
           # Mute
           snd_background.set_volume(0)
+      # Toggle placement hint, except in versus
+      elif event.key == pygame.K_h and game_state != "versus":
+        game_board.toggle_hint()
         
       else:
         # Key down handling specific to play state
         if game_state == "play":
+          # While watching a replay, left and right seek and other keys
+          # don't play
+          if replay_player:
+            if event.key == pygame.K_LEFT:
+              replay_player = game_board.seek_replay(replay_player, -replay_seek_time*update_rate)
+            elif event.key == pygame.K_RIGHT:
+              replay_player = game_board.seek_replay(replay_player, replay_seek_time*update_rate)
           # Move brick left (subtract from x coordinate)
-          if event.key == pygame.K_LEFT:
+          elif event.key == pygame.K_LEFT:
             game_board.move_left()
           # Move brick right (add to x coordinate)
           elif event.key == pygame.K_RIGHT:
@@ -122,6 +233,8 @@ while True:
             if menu_obj.selected == "Play":
               # Change program state to play mode
               game_state = "play"
+              # Board may have played versus before
+              game_board.keep_highscore = True
               # Start game
               game_board.start()
             # Exit game
@@ -129,48 +242,122 @@ while True:
               sys.exit()
             else:
               raise Exception("Unknown menu item.")
+        
+        # Key down handling specific to versus state, sent to the other
+        # player as well as applied here
+        elif game_state == "versus":
+          if event.key == pygame.K_LEFT:
+            versus_session.press(MOVE_LEFT)
+          elif event.key == pygame.K_RIGHT:
+            versus_session.press(MOVE_RIGHT)
+          elif event.key == pygame.K_DOWN:
+            versus_session.press(SPEED_UP)
+          elif event.key == pygame.K_x:
+            versus_session.press(ROTATE_CW)
+          elif event.key == pygame.K_z:
+            versus_session.press(ROTATE_CCW)
             
         else:
           raise Exception("Unknown game state.")            
         
     elif event.type == pygame.KEYUP:
       # Key up handling when in play state
-      if game_state == "play":
+      if game_state == "play" and not replay_player:
         # Decrease fall speed once DOWN is released
         if event.key == pygame.K_DOWN:
           game_board.slow_down()
+      elif game_state == "versus" and event.key == pygame.K_DOWN:
+        versus_session.press(SLOW_DOWN)
         
     # Quit game
     elif event.type == pygame.QUIT:
-      sys.exit()
+      quit_game()
       
-  # Blank screen
-  screen.fill(black)
-  
-  # Draw board area walls
-  game_board.draw_walls(screen)
-
-  # Draw menu
-  if game_state == "menu":
-    menu_obj.draw_menu(screen)
-  elif game_state == "play":
-    # If the game is not over
-    if not game_board.state == "game_over":
-      # Advance game
-      game_board.update()
-    # If the game is over, return to menu
-    else:
+  # Number of game updates due since the last frame
+  updates = update_clock.advance(pygame.time.get_ticks())
+
+  if game_state == "play":
+    for update in range(updates):
+      # If the game is not over
+      if not game_board.game_over() and not (replay_player and replay_player.done(game_board.engine)):
+        # Replay inputs due before the engine's next update
+        if replay_player and not game_board.chain:
+          replay_player.apply(game_board, game_board.engine.ticks)
+        # Advance game
+        game_board.update()
+        if spectator_server:
+          spectator_server.publish(game_board.engine)
+      # If the game is over, save its replay and return to menu
+      else:
+        if replay_player:
+          replay_player = None
+        else:
+          game_board.save_replay(replay_filename)
+        game_state = "menu"
+        break
+  elif game_state == "versus":
+    # Rolls back and simulates again as remote inputs come in. Goes on
+    # sending inputs after the result is in, so the other side gets it too.
+    versus_session.advance(updates)
+    # Show the result once no rollback can change it, then return to menu
+    if versus_result is None and versus_session.finished():
+      winner = versus_session.winner()
+      if winner is None:
+        versus_result = "Draw"
+      elif winner == versus_session.player:
+        versus_result = "You win"
+      else:
+        versus_result = "You lose"
+      versus_result_start = pygame.time.get_ticks()
+    elif versus_result and pygame.time.get_ticks() - versus_result_start >= versus_result_time:
+      versus_session.sock.close()
       game_state = "menu"
-  else:
+  elif game_state != "menu":
     raise Exception("Unknown game state")
+  alpha = update_clock.alpha()
+  # Play the sound effects asked for this frame
+  sound_queue.flush()
+
+  # Versus is redrawn whole each frame, since a rollback can change anything
+  if game_state == "versus":
+    for board, surface in zip(versus_boards, versus_surfaces):
+      board.draw_background(surface)
+      board.draw_bricks(surface)
+      board.draw_score(surface)
+    if not versus_session.started:
+      game_board.print_surface_center("Waiting for player %d" % (1 - versus_session.player), screen,
+                                      screen.get_rect().center, white, dark_gray)
+    elif versus_result:
+      game_board.print_surface_center(versus_result, screen, screen.get_rect().center, white, dark_gray)
+    pygame.display.update()
+    fps_clock.tick(render_fps)
+    continue
+
+  # Parts of the screen that changed. Everything is redrawn when switching
+  # between menu and play.
+  dirty = game_board.dirty_rects(alpha) + menu_obj.dirty_rects()
+  full_redraw = not dirty_rect_mode or game_state != drawn_state
+  drawn_state = game_state
   
-  # Draw falling and stacked bricks
-  game_board.draw_bricks(screen)
-  # Draw score
-  game_board.draw_score(screen)
-  
-  # Refresh display
-  pygame.display.update()    
-  # Ensure 60 FPS
-  fps_clock.tick(60)
-  
\ No newline at end of file
+  if full_redraw or dirty:
+    # Only draw inside the changed area
+    if not full_redraw:
+      screen.set_clip(dirty[0].unionall(dirty[1:]))
+    # Blank screen with board area walls
+    game_board.draw_background(screen)
+    # Draw menu
+    if game_state == "menu":
+      menu_obj.draw_menu(screen)
+    # Draw falling and stacked bricks
+    game_board.draw_bricks(screen, alpha)
+    # Draw score
+    game_board.draw_score(screen)
+    screen.set_clip(None)
+    
+    # Refresh display
+    if full_redraw:
+      pygame.display.update()
+    else:
+      pygame.display.update(dirty)
+  # Limit frame rate
+  fps_clock.tick(render_fps)
@@ -0,0 +1,73 @@
+'''
+Shared cache of fonts and rendered text for Something Something Bricks.
+
+Created on Oct 18, 2026
+
+@author: Dan
+'''
+
+import collections
+import pygame
+
+from bundle import bundle
+from color import *
+
+class TextCache:
+  """
+  Cache of fonts and rendered text surfaces. Surfaces are keyed by font,
+  size, string and colors, and the least recently used ones are dropped once
+  the cache is full. Text that doesn't change is only rendered once.
+  """
+
+  # Directory in the asset bundle where fonts are kept
+  _font_dir = "fonts/"
+  # Font used when none is given
+  _font_name = "OpenSans-Regular.ttf"
+
+  def __init__(self, max_surfaces=64):
+    """
+    Default constructor.
+    Arguments:
+      max_surfaces    number of rendered text surfaces to keep
+    """
+    self.max_surfaces = max_surfaces
+    # Font objects by (name, size)
+    self.fonts = {}
+    # Rendered text by (name, size, msg, color, bg_color), oldest use first
+    self.surfaces = collections.OrderedDict()
+
+  def font(self, size, name=None):
+    """
+    Return Pygame font object, loading it on first use.
+    Arguments:
+      size    point size of font
+      name    font file name in font directory. Default is _font_name.
+    """
+    key = (name or self._font_name, size)
+    font_obj = self.fonts.get(key)
+    if font_obj is None:
+      font_obj = self.fonts[key] = pygame.font.Font(bundle.open(self._font_dir + key[0]), size)
+    return font_obj
+
+  def render(self, msg, size, color=white, bg_color=None, name=None):
+    """
+    Return anti-aliased surface with msg rendered on it.
+    Arguments:
+      msg         String to be rendered.
+      size        point size of font
+      color       Color to use for text.
+      bg_color    Background color for text box. Default is no box.
+      name        font file name in font directory. Default is _font_name.
+    """
+    key = (name or self._font_name, size, msg, color, bg_color)
+    # Take out and put back so the entry becomes the most recently used
+    msg_surface = self.surfaces.pop(key, None)
+    if msg_surface is None:
+      msg_surface = self.font(size, name).render(msg, True, color, bg_color)
+      if len(self.surfaces) >= self.max_surfaces:
+        self.surfaces.popitem(last=False)
+    self.surfaces[key] = msg_surface
+    return msg_surface
+
+# Cache shared by everything that draws text
+text_cache = TextCache()
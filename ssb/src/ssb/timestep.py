@@ -0,0 +1,52 @@
+'''
+Fixed timestep clock for running game updates at a constant rate, whatever
+the render frame rate is.
+
+Created on Oct 18, 2026
+
+@author: Dan
+'''
+
+class FixedTimestep:
+  """
+  Real time is added to an accumulator and spent in whole game updates, so
+  game speed doesn't depend on how fast frames are drawn. The leftover
+  fraction of an update is used to interpolate what is drawn.
+  """
+
+  def __init__(self, rate=60, max_frame_time=250):
+    """
+    Default constructor.
+    Arguments:
+      rate              game updates per second
+      max_frame_time    most real time (milliseconds) counted for one frame, so
+                        a long stall doesn't cause a burst of catch-up updates
+    """
+    self.rate = rate
+    # Length of one update in milliseconds
+    self.step_time = 1000.0 / rate
+    self.max_frame_time = max_frame_time
+    # Real time not yet spent on updates
+    self.accumulator = 0.0
+    # Time of last call to advance
+    self.last_time = None
+
+  def advance(self, now):
+    """
+    Add the real time passed since the last call and return the number of
+    game updates to run.
+    Arguments:
+      now    current time in milliseconds, as from pygame.time.get_ticks
+    """
+    if self.last_time is not None:
+      self.accumulator += min(now - self.last_time, self.max_frame_time)
+    self.last_time = now
+    steps = int(self.accumulator // self.step_time)
+    self.accumulator -= steps * self.step_time
+    return steps
+
+  def alpha(self):
+    """
+    Return how far (0 to 1) real time is between the last update and the next.
+    """
+    return self.accumulator / self.step_time
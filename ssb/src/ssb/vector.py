@@ -0,0 +1,234 @@
+'''
+Batched game engine that steps many boards at once with NumPy. Meant for
+bot training, where thousands of games run together.
+
+Created on Oct 18, 2026
+
+@author: Dan
+'''
+
+import numpy
+
+from engine import (BREAKER, BROKEN, CCW, CW, DROP, EMPTY, LEFT, RIGHT, Engine, active_colors,
+                    cell_dtype, col_tops, drop_cells, grow_regions, triggered_breakers)
+
+class VectorBoard:
+  """
+  N boards held as one (N, cols, rows) array of cell codes. Each step applies
+  one action per board with the same rules as Engine. There is no gravity:
+  the falling pair stays at its row until a DROP action drops it, which locks
+  it and resolves every break and drop of the chain. Finished boards are
+  reset automatically.
+
+  One rule differs from Engine. Here a brick that would lock above the top
+  row ends the game. Engine locks it at row -1, which wraps around to the
+  bottom cell of its column, and only ends the game once the spawn cells are
+  taken. This only comes up on a column filled to the top, but games there
+  play out differently, so results from here don't carry over to Engine
+  exactly.
+  """
+
+  def __init__(self, num_boards, board_size, seed=None):
+    """
+    Default constructor.
+    Arguments:
+      num_boards    number of boards N
+      board_size    number of (columns, rows) of each board
+      seed          seed for the random number generator used for new bricks
+    """
+    # Save parameters
+    self.num_boards = num_boards
+    self.num_cols, self.num_rows = self.board_size = board_size
+    # Column where bricks are spawned (0 indexed)
+    self.gen_col = self.num_cols // 2
+    # Random number generator for new bricks
+    self.random = numpy.random.RandomState(seed)
+    # Board indices, used to pick one column per board
+    self.index = numpy.arange(num_boards)
+
+    # Stacked bricks of all boards, indexed by [board, col, row]
+    self.grid = numpy.zeros((num_boards,) + self.board_size, dtype=cell_dtype)
+    # Score of each board
+    self.score = numpy.zeros(num_boards, dtype=numpy.int64)
+    # Falling pair of each board, first (originally top) brick then second
+    self.pair_cols = numpy.zeros((num_boards, 2), dtype=numpy.intp)
+    self.pair_rows = numpy.zeros((num_boards, 2), dtype=numpy.intp)
+    self.pair_codes = numpy.zeros((num_boards, 2), dtype=cell_dtype)
+    # Next brick pair of each board
+    self.next_codes = numpy.zeros((num_boards, 2), dtype=cell_dtype)
+
+    self.reset()
+
+  def gen_codes(self, count):
+    """
+    Return (count, 2) array of random cell codes for new brick pairs.
+    Arguments:
+      count    number of pairs to generate
+    """
+    codes = self.random.randint(1, Engine._num_colors + 1, size=(count, 2))
+    breakers = self.random.random_sample((count, 2)) < Engine._breaker_prob
+    return (codes | numpy.where(breakers, BREAKER, 0)).astype(cell_dtype)
+
+  def reset(self, boards=None):
+    """
+    Start new games and return the observations.
+    Arguments:
+      boards    boolean mask or indices of boards to reset. Default is all.
+    """
+    if boards is None:
+      boards = self.index
+    boards = self.index[boards]
+    self.grid[boards] = EMPTY
+    self.score[boards] = 0
+    self.next_codes[boards] = self.gen_codes(boards.size)
+    self.spawn(boards)
+    return self.observe()
+
+  def spawn(self, boards):
+    """
+    Create new dropping bricks from the next bricks.
+    Arguments:
+      boards    indices of boards to spawn on
+    """
+    self.pair_codes[boards] = self.next_codes[boards]
+    self.pair_cols[boards] = self.gen_col
+    self.pair_rows[boards] = (0, 1)
+    self.next_codes[boards] = self.gen_codes(boards.size)
+
+  def observe(self):
+    """
+    Return a copy of the stacked bricks of all boards. The falling and next
+    pairs are in pair_cols, pair_rows, pair_codes and next_codes.
+    """
+    return self.grid.copy()
+
+  def step(self, actions):
+    """
+    Apply one action to each board. Return (observations, score deltas,
+    done flags). Boards that are done have been reset, so their observation
+    is the start of a new game.
+    Arguments:
+      actions    length N array of LEFT, RIGHT, CW, CCW or DROP
+    """
+    actions = numpy.asarray(actions)
+    # Row of the first empty space in each column, as (N, cols)
+    free = col_tops(self.grid) - 1
+    last_col = self.num_cols - 1
+
+    def free_at(cols):
+      # Empty row in one column per board, clipped to the play area
+      return free[self.index, numpy.clip(cols, 0, last_col)]
+
+    col1, col2 = self.pair_cols[:, 0], self.pair_cols[:, 1]
+    row1, row2 = self.pair_rows[:, 0], self.pair_rows[:, 1]
+    top = numpy.minimum(row1, row2)
+    bottom = numpy.maximum(row1, row2)
+    left = numpy.minimum(col1, col2)
+    right = numpy.maximum(col1, col2)
+    # Orientation of first brick relative to second
+    above = row1 < row2
+    below = row1 > row2
+    right_of = (row1 == row2) & (col1 > col2)
+    left_of = (row1 == row2) & (col1 < col2)
+    # Free rows next to the first brick
+    free_left = free_at(col1 - 1)
+    free_right = free_at(col1 + 1)
+
+    # Whole pair moves, see Engine.move_left and Engine.move_right
+    move_left = (actions == LEFT) & (left > 0) & \
+      (bottom < free_left) & (top < free_at(col2 - 1))
+    move_right = (actions == RIGHT) & (right < last_col) & \
+      (bottom < free_right) & (top < free_at(col2 + 1))
+    shift = move_right.astype(numpy.intp) - move_left
+
+    # First brick moves, see Engine.rotate_cw and Engine.rotate_ccw
+    cw = actions == CW
+    ccw = actions == CCW
+    cw_down_right = cw & above & (right < last_col) & (bottom < free_right)
+    cw_up_left = cw & below & (left > 0) & (top < free_left)
+    cw_down_left = cw & right_of & (bottom + 1 < free_left)
+    cw_up_right = cw & left_of
+    ccw_down_left = ccw & above & (left > 0) & (bottom < free_left)
+    ccw_up_right = ccw & below & (right < last_col) & (top < free_right)
+    ccw_up_left = ccw & right_of
+    ccw_down_right = ccw & left_of & (bottom + 1 < free_right)
+    down = cw_down_right | cw_down_left | ccw_down_left | ccw_down_right
+    up = cw_up_left | cw_up_right | ccw_up_right | ccw_up_left
+    turn_right = cw_down_right | cw_up_right | ccw_up_right | ccw_down_right
+    turn_left = cw_up_left | cw_down_left | ccw_down_left | ccw_up_left
+
+    self.pair_cols += shift[:, None]
+    col1 += turn_right
+    col1 -= turn_left
+    row1 += down
+    row1 -= up
+
+    # Drop pairs
+    score = self.score.copy()
+    dropped = numpy.flatnonzero(actions == DROP)
+    done = numpy.zeros(self.num_boards, dtype=bool)
+    if dropped.size:
+      done[dropped] = self.drop(dropped, free[dropped])
+
+    delta = self.score - score
+    # Reset finished games
+    if done.any():
+      self.reset(done)
+    return self.observe(), delta, done
+
+  def drop(self, boards, free):
+    """
+    Drop and lock the falling pairs of boards, resolve chains and spawn new
+    pairs. Return boolean array of which boards have ended.
+    Arguments:
+      boards    indices of boards to drop on
+      free      (len(boards), cols) empty row of each column
+    """
+    index = numpy.arange(boards.size)
+    cols = self.pair_cols[boards]
+    rows = self.pair_rows[boards]
+    codes = self.pair_codes[boards]
+    # Brick that is lower lands first (in case stacked)
+    first = (rows[:, 1] > rows[:, 0]).astype(numpy.intp)
+    second = 1 - first
+    first_col = cols[index, first]
+    second_col = cols[index, second]
+    first_row = free[index, first_col]
+    second_row = numpy.where(second_col == first_col, first_row - 1, free[index, second_col])
+    # Bricks locked above the top of the board end the game. Engine wraps
+    # them to the bottom row instead, see VectorBoard.
+    ended = (first_row < 0) | (second_row < 0)
+    fits = ~ended
+    self.grid[boards[fits], first_col[fits], first_row[fits]] = codes[index, first][fits]
+    self.grid[boards[fits], second_col[fits], second_row[fits]] = codes[index, second][fits]
+
+    self.resolve(boards[fits])
+
+    # Spawn new bricks if the spawn spaces are clear
+    ended |= self.grid[boards, self.gen_col, 1:3].any(axis=-1)
+    self.spawn(boards[~ended])
+    return ended
+
+  def resolve(self, boards):
+    """
+    Break and drop bricks until no breaker touches a brick of its color.
+    Arguments:
+      boards    indices of boards to resolve
+    """
+    while boards.size:
+      grid = self.grid[boards]
+      active = active_colors(grid)
+      seeds = triggered_breakers(grid, active)
+      # Only keep boards that still have breaks
+      breaking = seeds.any(axis=(1, 2))
+      boards = boards[breaking]
+      if not boards.size:
+        break
+      grid = grid[breaking]
+      region = grow_regions(seeds[breaking], active[breaking])
+      # Increment score for each brick destroyed
+      self.score[boards] += 10 * region.sum(axis=(1, 2))
+      # Broken bricks are removed by the drop
+      grid[region] |= BROKEN
+      drop_cells(grid)
+      self.grid[boards] = grid
@@ -0,0 +1,397 @@
+'''
+Spectator wall for Something Something Bricks. Tiles many games in one
+window, for bot tournaments and the attract screen. Games are played here
+by the bot, or watched from spectator servers.
+
+Usage:
+  python wall.py [-n BOARDS] [--random] [--frames N]    play games here
+  python wall.py HOST:PORT...                            watch streams
+
+Created on Oct 18, 2026
+
+@author: Dan
+'''
+
+import argparse
+import math
+import numpy
+import pygame
+import random
+import socket
+import sys
+import time
+
+from assets import atlas
+from bot import Bot
+from brick import cell_image
+from color import *
+from engine import CCW, CW, LEFT, RIGHT, Engine, cell_dtype
+from spectate import StreamDecoder
+from text import text_cache
+
+# Engine method called for each bot move
+_move_methods = {LEFT: "move_left", RIGHT: "move_right", CW: "rotate_cw", CCW: "rotate_ccw"}
+
+class SpriteSet:
+  """
+  Brick images scaled once to one tile size and converted to the display
+  format, so tiles never scale anything while drawing.
+  """
+
+  def __init__(self, brick_size):
+    """
+    Default constructor.
+    Arguments:
+      brick_size    (width, height) pixel size of each brick
+    """
+    self.brick_size = brick_size
+    # Scaled images by cell code, made on first use
+    self.images = {}
+
+  def image(self, code):
+    """
+    Return the scaled image for a non-empty engine cell code.
+    Arguments:
+      code    cell code (color index plus breaker/broken flags)
+    """
+    image = self.images.get(code)
+    if image is None:
+      image = pygame.transform.smoothscale(cell_image(code), self.brick_size)
+      if pygame.display.get_surface():
+        image = image.convert()
+      self.images[code] = image
+    return image
+
+# Sprite sets by brick size, shared by every tile of that size
+_sprite_sets = {}
+
+def sprite_set(brick_size):
+  """
+  Return SpriteSet for a brick size.
+  Arguments:
+    brick_size    (width, height) pixel size of each brick
+  """
+  sprites = _sprite_sets.get(brick_size)
+  if sprites is None:
+    sprites = _sprite_sets[brick_size] = SpriteSet(brick_size)
+  return sprites
+
+def pair_cells(source):
+  """
+  Return (code1, col1, y1, code2, col2, y2) of the falling pair of an
+  Engine or StreamDecoder, or None if there is none.
+  """
+  p = source.pair
+  if p is None or isinstance(p, tuple):
+    return p
+  return (p.code1, p.col1, p.y1, p.code2, p.col2, p.y2)
+
+class Tile:
+  """
+  One game on the wall: its board, next pair and score, drawn from an Engine
+  or a StreamDecoder. The stacked bricks are kept in a layer that is only
+  redrawn where cells changed.
+  """
+
+  # Rows at the top of the board that aren't shown, as in Board
+  _hidden_rows = 2
+
+  def __init__(self, source, topleft, brick_size, board_size, row_height=32):
+    """
+    Default constructor.
+    Arguments:
+      source        Engine or StreamDecoder of the game
+      topleft       (x, y) pixel top left corner of the tile
+      brick_size    (width, height) pixel size of each brick
+      board_size    number of (columns, rows)
+      row_height    engine y units per row
+    """
+    self.source = source
+    self.left, self.top = topleft
+    self.bw, self.bh = self.brick_size = brick_size
+    self.num_cols, self.num_rows = board_size
+    self.row_height = row_height
+    self.sprites = sprite_set(brick_size)
+    # Board area, next pair and score positions
+    self.board_rect = pygame.Rect((self.left, self.top),
+                                  (self.num_cols*self.bw, (self.num_rows - self._hidden_rows)*self.bh))
+    self.next_topleft = (self.board_rect.right + self.bw // 2, self.top)
+    self.score_topleft = (self.left, self.board_rect.bottom + 2)
+    self.font_size = max(self.bh // 2, 8)
+    # Stacked bricks layer and the grid it shows
+    self.stack = None
+    self.stack_grid = None
+    # Score text surface and the score it shows
+    self.score_surface = None
+    self.drawn_score = None
+    # Whether the game is still coming in. Tiles of lost streams keep their
+    # last state, marked as disconnected.
+    self.connected = True
+
+  def stack_layer(self, surface):
+    """
+    Return surface of the stacked bricks, redrawing only cells that changed
+    since the last call.
+    Arguments:
+      surface    Pygame surface the layer will be drawn to, for pixel format
+    """
+    grid = self.source.grid
+    if self.stack is None:
+      self.stack = pygame.Surface((self.num_cols*self.bw, self.num_rows*self.bh), 0, surface)
+      self.stack.fill(black)
+      self.stack_grid = numpy.zeros_like(grid)
+    cols, rows = (grid != self.stack_grid).nonzero()
+    if cols.size:
+      blits = []
+      for col, row in zip(cols.tolist(), rows.tolist()):
+        rect = pygame.Rect((col*self.bw, row*self.bh), self.brick_size)
+        self.stack.fill(black, rect)
+        if grid[col, row]:
+          blits.append((self.sprites.image(grid[col, row]), rect))
+      self.stack.blits(blits, False)
+      self.stack_grid[:] = grid
+    return self.stack
+
+  def blits(self, surface):
+    """
+    Return list of (source, dest, area) blits that draw this tile.
+    Arguments:
+      surface    Pygame surface the tile will be drawn to
+    """
+    hidden = self._hidden_rows*self.bh
+    blits = [(self.stack_layer(surface), self.board_rect.topleft,
+              pygame.Rect((0, hidden), self.board_rect.size))]
+    pair = pair_cells(self.source)
+    if pair:
+      for code, col, y in (pair[:3], pair[3:]):
+        # Bricks in the hidden rows are cut off at the top of the board
+        y = y*self.bh // self.row_height - hidden
+        if y > -self.bh:
+          cut = max(-y, 0)
+          blits.append((self.sprites.image(code), (self.left + col*self.bw, self.top + y + cut),
+                        pygame.Rect((0, cut), (self.bw, self.bh - cut))))
+    next_x, next_y = self.next_topleft
+    for i, code in enumerate(self.source.next_codes):
+      if code:
+        blits.append((self.sprites.image(code), (next_x, next_y + i*self.bh), None))
+    if self.source.score != self.drawn_score:
+      self.drawn_score = self.source.score
+      self.score_surface = text_cache.font(self.font_size).render("%d" % self.drawn_score, True, white)
+    blits.append((self.score_surface, self.score_topleft, None))
+    if not self.connected:
+      label = text_cache.render("Disconnected", self.font_size, white, dark_gray)
+      blits.append((label, label.get_rect(center=self.board_rect.center), None))
+    return blits
+
+class BoardWall:
+  """
+  Tiles laid out in a grid over a window. Frames around the boards are
+  drawn once into a background, and each frame is the background plus one
+  blits call for every tile.
+  """
+
+  def __init__(self, size, sources, board_size, row_height=32):
+    """
+    Default constructor.
+    Arguments:
+      size          (width, height) pixel size of the window
+      sources       list of Engine or StreamDecoder, one per tile
+      board_size    number of (columns, rows)
+      row_height    engine y units per row
+    """
+    self.size = width, height = size
+    num_cols, num_rows = board_size
+    # Bricks across and down one tile, with room for the next pair, the
+    # score and a gap
+    across = num_cols + 3
+    down = num_rows - Tile._hidden_rows + 2
+    # Tile columns giving the biggest bricks
+    best = None
+    for columns in range(1, len(sources) + 1):
+      rows = int(math.ceil(len(sources) / float(columns)))
+      brick = min(width // (columns*across), height // (rows*down))
+      if best is None or brick > best[0]:
+        best = (brick, columns)
+    brick, columns = best
+    self.tiles = []
+    for i, source in enumerate(sources):
+      topleft = ((i % columns)*across*brick + brick // 2, (i // columns)*down*brick + brick // 2)
+      self.tiles.append(Tile(source, topleft, (brick, brick), board_size, row_height))
+    self.background = None
+
+  def draw(self, surface):
+    """
+    Draw every tile to a surface covering it all.
+    Arguments:
+      surface    Pygame surface to draw to
+    """
+    if self.background is None:
+      self.background = pygame.Surface(surface.get_size(), 0, surface)
+      self.background.fill(black)
+      for tile in self.tiles:
+        pygame.draw.rect(self.background, gray, tile.board_rect.inflate(4, 4), 1)
+    surface.blit(self.background, (0, 0))
+    blits = []
+    for tile in self.tiles:
+      blits += tile.blits(surface)
+    surface.blits(blits, False)
+
+class BotGame:
+  """
+  Game played by the bot on the wall, started again when it ends.
+  """
+
+  def __init__(self, board_size, row_height, seed, bot=None):
+    """
+    Default constructor.
+    Arguments:
+      board_size    number of (columns, rows)
+      row_height    engine y units per row
+      seed          seed of the first game
+      bot           Bot to place pairs with, or None for random inputs
+    """
+    self.engine = Engine(board_size, row_height)
+    self.engine.start(seed)
+    self.bot = bot
+    self.random = random.Random(seed)
+    self.pair = None
+
+  def update(self, may_plan=True):
+    """
+    Give the engine its inputs and advance it by one update.
+    Arguments:
+      may_plan    whether the bot may place a new pair this update. If
+                  not, the pair falls on until a later update.
+    """
+    engine = self.engine
+    if engine.game_over():
+      engine.start(self.random.getrandbits(32))
+    if self.bot:
+      if may_plan and engine.pair and engine.pair is not self.pair:
+        self.pair = engine.pair
+        plan = self.bot.plan(engine)
+        for move in plan.moves if plan else ():
+          getattr(engine, _move_methods[move])()
+        engine.speed_up()
+    elif self.random.random() < 0.1:
+      self.random.choice((engine.move_left, engine.move_right, engine.rotate_cw,
+                          engine.rotate_ccw, engine.speed_up))()
+    engine.update()
+
+class StreamSource:
+  """
+  Spectator stream being watched, read without blocking.
+  """
+
+  def __init__(self, address, board_size):
+    """
+    Default constructor.
+    Arguments:
+      address       "host:port" of a spectator server
+      board_size    number of (columns, rows) shown until the stream starts
+    """
+    host, port = address.rsplit(":", 1)
+    self.sock = socket.create_connection((host, int(port)))
+    self.sock.setblocking(False)
+    self.decoder = StreamDecoder()
+    # Shown empty until the first keyframe comes in
+    self.decoder.grid = numpy.zeros(board_size, dtype=cell_dtype)
+    # Whether the server is still sending
+    self.connected = True
+
+  def update(self, may_plan=True):
+    """
+    Apply whatever the server has sent. Once the server closes the stream
+    or the connection fails, the stream is marked disconnected and keeps its
+    last state.
+    Arguments:
+      may_plan    unused, as streams have no bot
+    """
+    while self.connected:
+      try:
+        data = self.sock.recv(65536)
+      except (BlockingIOError, InterruptedError):
+        return
+      except OSError:
+        # Such as the server going away without closing the stream
+        data = b""
+      if not data:
+        self.connected = False
+        self.sock.close()
+        return
+      self.decoder.feed(data)
+
+def parse_args(argv):
+  """
+  Return argparse Namespace of command line options.
+  Arguments:
+    argv    command line arguments, without the program name
+  """
+  parser = argparse.ArgumentParser(description="Show many games at once.")
+  parser.add_argument("streams", nargs="*", metavar="HOST:PORT", help="spectator servers to watch")
+  parser.add_argument("-n", "--boards", type=int, default=16, help="number of games to play here")
+  parser.add_argument("--random", action="store_true", help="play with random inputs instead of the bot")
+  parser.add_argument("--size", default="1280x720", help="window size")
+  parser.add_argument("--frames", type=int, default=0,
+                      help="quit after this many frames and print frame times (0 to run until closed)")
+  return parser.parse_args(argv)
+
+def main(argv):
+  """
+  Run the wall until the window is closed.
+  Arguments:
+    argv    command line arguments, without the program name
+  """
+  settings = parse_args(argv)
+  board_size, row_height = (6, 15), 32
+  update_rate = 60
+  # Milliseconds per frame the bot may spend placing pairs. Once it is
+  # used up, games wait for a later frame.
+  plan_budget = 4
+  pygame.init()
+  screen = pygame.display.set_mode(tuple(int(n) for n in settings.size.split("x")))
+  pygame.display.set_caption("Something Something Bricks")
+  atlas.prewarm()
+
+  if settings.streams:
+    games = [StreamSource(address, board_size) for address in settings.streams]
+    sources = [game.decoder for game in games]
+  else:
+    # One bot for all games; its tables are shared between them
+    bot = None if settings.random else Bot(board_size, row_height, depth=1)
+    games = [BotGame(board_size, row_height, seed, bot) for seed in range(settings.boards)]
+    sources = [game.engine for game in games]
+  wall = BoardWall(screen.get_size(), sources, board_size, row_height)
+
+  clock = pygame.time.Clock()
+  update_times = []
+  draw_times = []
+  frame = 0
+  while not settings.frames or frame < settings.frames:
+    frame += 1
+    for event in pygame.event.get():
+      if event.type == pygame.QUIT or (event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE):
+        return 0
+    start = time.perf_counter()
+    # Games are taken in turns to go first, so none waits long for the bot
+    first = frame % len(games)
+    for game in games[first:] + games[:first]:
+      game.update(time.perf_counter() - start < plan_budget / 1000.0)
+    if settings.streams:
+      for tile, game in zip(wall.tiles, games):
+        tile.connected = game.connected
+    drawn = time.perf_counter()
+    wall.draw(screen)
+    pygame.display.update()
+    update_times.append(drawn - start)
+    draw_times.append(time.perf_counter() - drawn)
+    clock.tick(update_rate)
+
+  for name, times in (("update", update_times), ("draw", draw_times)):
+    times.sort()
+    print("%s: median %.2f ms, p99 %.2f ms, max %.2f ms" %
+          (name, times[len(times) // 2]*1e3, times[int(len(times)*0.99)]*1e3, times[-1]*1e3))
+  return 0
+
+if __name__ == "__main__":
+  sys.exit(main(sys.argv[1:]))